@@ -0,0 +1,287 @@
+# alert_rules.py
+"""
+Incremental evaluation of declarative alert rules over a metrics stream.
+
+    rules = [
+        Rule("slow_p95", "prediction_time", ">", 2.0, agg="p95", window=300,
+             for_seconds=300, clear_threshold=1.5),
+        Rule("memory", "memory_usage_mb", ">", 1000, agg="max", window=60),
+        Rule("latency_trend", "prediction_time", ">", 0.01, agg="rate", window=600),
+    ]
+    engine = RuleEngine(rules)
+    events = engine.update({"prediction_time": 2.4, ...}, timestamp)
+
+Every rule reads a windowed aggregate of one metric — last value, mean,
+max, min, rate of change or a percentile — and aggregates are shared by
+all rules that need the same one.  Each aggregate is updated in amortised
+O(1) per sample (running sums, monotonic deques), and a percentile rule
+"pQ > X" is evaluated as "more than 1 - Q of the window is above X",
+which is again a running count.  So an update costs O(1) per rule and
+never rescans history.
+
+A rule fires once its condition has held for `for_seconds`, and resolves
+when the aggregate crosses back over `clear_threshold` (hysteresis;
+defaults to `threshold`).  `update` returns only state changes.
+"""
+import re
+import math
+import time
+import numbers
+import operator
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Mapping, Optional, Sequence
+
+OPS: Dict[str, Callable[[float, float], bool]] = {
+    ">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le,
+}
+_PERCENTILE = re.compile(r"p(\d+(?:\.\d+)?)$")
+
+
+# ─────────────────────────────
+# Windowed aggregates
+# ─────────────────────────────
+class Last:
+    def __init__(self):
+        self.current = None
+
+    def update(self, ts: float, value: float) -> None:
+        self.current = value
+
+    def value(self) -> Optional[float]:
+        return self.current
+
+
+class WindowMean:
+    def __init__(self, window: float):
+        self.window = window
+        self.items = deque()
+        self.total = 0.0
+
+    def update(self, ts: float, value: float) -> None:
+        self.items.append((ts, value))
+        self.total += value
+        while self.items[0][0] <= ts - self.window:
+            self.total -= self.items.popleft()[1]
+
+    def value(self) -> Optional[float]:
+        return self.total / len(self.items) if self.items else None
+
+
+class WindowExtreme:
+    """Sliding max (or min) with a monotonic deque."""
+
+    def __init__(self, window: float, mode: str = "max"):
+        self.window = window
+        self.better = operator.ge if mode == "max" else operator.le
+        self.items = deque()                        # values monotonic from the left
+
+    def update(self, ts: float, value: float) -> None:
+        while self.items and self.better(value, self.items[-1][1]):
+            self.items.pop()
+        self.items.append((ts, value))
+        while self.items[0][0] <= ts - self.window:
+            self.items.popleft()
+
+    def value(self) -> Optional[float]:
+        return self.items[0][1] if self.items else None
+
+
+class RateOfChange:
+    """(newest - oldest) / elapsed over the window, per second."""
+
+    def __init__(self, window: float):
+        self.window = window
+        self.items = deque()
+
+    def update(self, ts: float, value: float) -> None:
+        self.items.append((ts, value))
+        while self.items[0][0] <= ts - self.window:
+            self.items.popleft()
+
+    def value(self) -> Optional[float]:
+        if len(self.items) < 2:
+            return None
+        (t0, v0), (t1, v1) = self.items[0], self.items[-1]
+        return (v1 - v0) / (t1 - t0) if t1 > t0 else None
+
+
+class FractionAbove:
+    """Share of the window's samples strictly above `threshold`."""
+
+    def __init__(self, window: float, threshold: float):
+        self.window = window
+        self.threshold = threshold
+        self.items = deque()
+        self.above = 0
+
+    def update(self, ts: float, value: float) -> None:
+        hit = value > self.threshold
+        self.items.append((ts, hit))
+        self.above += hit
+        while self.items[0][0] <= ts - self.window:
+            self.above -= self.items.popleft()[1]
+
+    def value(self) -> Optional[float]:
+        return self.above / len(self.items) if self.items else None
+
+
+# ─────────────────────────────
+# Rules
+# ─────────────────────────────
+@dataclass
+class Rule:
+    name: str
+    metric: str
+    op: str
+    threshold: float
+    agg: str = "last"                   # last | mean | max | min | rate | p<q>, e.g. p95
+    window: float = 60.0                # seconds
+    for_seconds: float = 0.0
+    clear_threshold: Optional[float] = None
+    message: Optional[str] = None       # format fields: name, metric, agg, op, threshold, value
+
+    def __post_init__(self):
+        if self.op not in OPS:
+            raise ValueError(f"rule {self.name}: unknown operator {self.op!r}")
+        if self.agg not in ("last", "mean", "max", "min", "rate") and not _PERCENTILE.match(self.agg):
+            raise ValueError(f"rule {self.name}: unknown aggregate {self.agg!r}")
+        if self.window <= 0:
+            raise ValueError(f"rule {self.name}: window must be positive, got {self.window}")
+        if self.for_seconds < 0:
+            raise ValueError(f"rule {self.name}: for_seconds must be >= 0, got {self.for_seconds}")
+
+    @property
+    def quantile(self) -> Optional[float]:
+        m = _PERCENTILE.match(self.agg)
+        return float(m.group(1)) / 100 if m else None
+
+
+@dataclass
+class AlertEvent:
+    rule: Rule
+    state: str                          # "firing" | "resolved"
+    value: float
+    timestamp: float
+    message: str
+
+
+class _RuleState:
+    def __init__(self, rule: Rule, fire_agg, clear_agg):
+        self.rule = rule
+        self.fire_agg, self.clear_agg = fire_agg, clear_agg
+        self.compare = OPS[rule.op]
+        self.clear_threshold = rule.threshold if rule.clear_threshold is None else rule.clear_threshold
+        self.firing = False
+        self.pending_since = None
+
+    def _holds(self, agg, threshold: float) -> bool:
+        value = agg.value()
+        if value is None:
+            return False
+        q = self.rule.quantile
+        if q is None:
+            return self.compare(value, threshold)
+        # pQ > X  ⇔  more than (1 - Q) of the window lies above X
+        if self.rule.op in (">", ">="):
+            return value > 1 - q
+        return 1 - value > q
+
+    def evaluate(self, ts: float) -> Optional[AlertEvent]:
+        if self.firing:
+            if not self._holds(self.clear_agg, self.clear_threshold):
+                self.firing, self.pending_since = False, None
+                return self._event("resolved", ts)
+            return None
+        if not self._holds(self.fire_agg, self.rule.threshold):
+            self.pending_since = None
+            return None
+        if self.pending_since is None:
+            self.pending_since = ts
+        if ts - self.pending_since >= self.rule.for_seconds:
+            self.firing = True
+            return self._event("firing", ts)
+        return None
+
+    def _event(self, state: str, ts: float) -> AlertEvent:
+        rule, value = self.rule, self.fire_agg.value()
+        if rule.message:
+            text = rule.message.format(name=rule.name, metric=rule.metric, agg=rule.agg,
+                                       op=rule.op, threshold=rule.threshold, value=value)
+        elif rule.quantile is not None:
+            text = (f"{rule.metric} {rule.agg} {rule.op} {rule.threshold} over {rule.window:g}s "
+                    f"({value:.1%} of samples above {rule.threshold})")
+        else:
+            text = f"{rule.metric} {rule.agg} = {value:.4g} ({rule.op} {rule.threshold})"
+        if state == "resolved":
+            text = f"RESOLVED {rule.name}: {text}"
+        return AlertEvent(rule, state, value, ts, text)
+
+
+class RuleEngine:
+    def __init__(self, rules: Sequence[Rule] = ()):
+        self._aggs: Dict[tuple, object] = {}
+        self._aggs_by_metric: Dict[str, List] = defaultdict(list)
+        self._rules_by_metric: Dict[str, List[_RuleState]] = defaultdict(list)
+        for rule in rules:
+            self.add(rule)
+
+    def _aggregate(self, rule: Rule, threshold: float):
+        q = rule.quantile
+        if q is not None:
+            key = (rule.metric, "above", rule.window, threshold)
+            make = lambda: FractionAbove(rule.window, threshold)
+        elif rule.agg == "last":
+            key, make = (rule.metric, "last"), Last
+        elif rule.agg == "mean":
+            key, make = (rule.metric, "mean", rule.window), lambda: WindowMean(rule.window)
+        elif rule.agg in ("max", "min"):
+            key = (rule.metric, rule.agg, rule.window)
+            make = lambda: WindowExtreme(rule.window, rule.agg)
+        else:
+            key, make = (rule.metric, "rate", rule.window), lambda: RateOfChange(rule.window)
+        if key not in self._aggs:
+            self._aggs[key] = make()
+            self._aggs_by_metric[rule.metric].append(self._aggs[key])
+        return self._aggs[key]
+
+    def add(self, rule: Rule) -> None:
+        fire = self._aggregate(rule, rule.threshold)
+        clear = fire
+        if rule.quantile is not None and rule.clear_threshold is not None:
+            clear = self._aggregate(rule, rule.clear_threshold)
+        self._rules_by_metric[rule.metric].append(_RuleState(rule, fire, clear))
+
+    @property
+    def firing(self) -> List[Rule]:
+        return [s.rule for states in self._rules_by_metric.values() for s in states if s.firing]
+
+    def update(self, metrics: Mapping[str, float], timestamp: Optional[float] = None) -> List[AlertEvent]:
+        """Feed one metrics record; returns the rules that started firing or resolved."""
+        ts = time.time() if timestamp is None else timestamp
+        events = []
+        for metric, value in metrics.items():
+            aggs = self._aggs_by_metric.get(metric)
+            # NaN/inf would stick in running sums (WindowMean) for good
+            if not aggs or not isinstance(value, numbers.Real) or not math.isfinite(value):
+                continue
+            for agg in aggs:
+                agg.update(ts, value)
+            for state in self._rules_by_metric[metric]:
+                event = state.evaluate(ts)
+                if event is not None:
+                    events.append(event)
+        return events
+
+
+def default_rules(thresholds: Mapping[str, float]) -> List[Rule]:
+    """Streaming counterparts of AlertSystem.alert_thresholds."""
+    return [
+        Rule("accuracy_drop", "accuracy", "<", 1 - thresholds["accuracy_drop"]),
+        Rule("prediction_time_p95", "prediction_time", ">", thresholds["prediction_time"],
+             agg="p95", window=300, for_seconds=60,
+             clear_threshold=0.8 * thresholds["prediction_time"]),
+        Rule("memory_usage", "memory_usage_mb", ">", thresholds["memory_usage"],
+             agg="max", window=60, clear_threshold=0.9 * thresholds["memory_usage"]),
+        Rule("error_rate", "error_rate", ">", thresholds["error_rate"], agg="mean", window=300),
+    ]
@@ -1,15 +1,23 @@
+import re
+import time
+import queue
 import smtplib
+import threading
+import traceback
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import json
 from datetime import datetime
 
+from alert_rules import RuleEngine, default_rules
+
 class AlertSystem:
-    def __init__(self, smtp_server, smtp_port, email, password):
+    def __init__(self, smtp_server, smtp_port, email, password, use_tls=True):
         self.smtp_server = smtp_server
         self.smtp_port = smtp_port
         self.email = email
         self.password = password
+        self.use_tls = use_tls          # off for a local stand-in such as aiosmtpd
         self.alert_thresholds = {
             'accuracy_drop': 0.05,
             'prediction_time': 2.0,
@@ -29,12 +37,42 @@ class AlertSystem:
         if 'memory_usage_mb' in metrics and metrics['memory_usage_mb'] > self.alert_thresholds['memory_usage']:
             alerts.append(f"Memory usage high: {metrics['memory_usage_mb']:.1f}MB")
         
+        if 'error_rate' in metrics and metrics['error_rate'] > self.alert_thresholds['error_rate']:
+            alerts.append(f"Error rate exceeded threshold: {metrics['error_rate']:.2%}")
+        
         return alerts
     
-    def send_alert_email(self, alerts, recipient_emails):
-        if not alerts:
-            return
+    def watch(self, monitor, dispatcher, rules=None):
+        """
+        Evaluate `rules` incrementally on every record of a
+        ModelPerformanceMonitor and hand firing/resolved alerts to an
+        AlertDispatcher.  The default is the windowed alert_thresholds rules
+        for metrics the monitor records (prediction time and memory); it has
+        no labels, so accuracy and error-rate rules are left out — pass them
+        in `rules` and feed their metrics to the returned engine yourself.
+        """
+        if rules is None:
+            recorded = set(monitor.history.data.dtype.names)
+            rules = [r for r in default_rules(self.alert_thresholds) if r.metric in recorded]
+        engine = RuleEngine(rules)
+        
+        def on_metrics(metrics, timestamp):
+            events = engine.update(metrics, timestamp)
+            if events:
+                dispatcher.submit([e.message for e in events])
         
+        monitor.add_listener(on_metrics)
+        return engine
+    
+    def connect(self, timeout=10):
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=timeout)
+        if self.use_tls:
+            server.starttls()
+        if self.password:
+            server.login(self.email, self.password)
+        return server
+    
+    def build_message(self, alerts, recipient_emails):
         msg = MIMEMultipart()
         msg['From'] = self.email
         msg['To'] = ', '.join(recipient_emails)
@@ -42,11 +80,16 @@ class AlertSystem:
         
         body = "Model Performance Alerts:\n\n" + '\n'.join(f"• {alert}" for alert in alerts)
         msg.attach(MIMEText(body, 'plain'))
+        return msg
+    
+    def send_alert_email(self, alerts, recipient_emails):
+        if not alerts:
+            return
+        
+        msg = self.build_message(alerts, recipient_emails)
         
         try:
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.email, self.password)
+            server = self.connect()
             server.send_message(msg)
             server.quit()
             print("Alert email sent successfully")
@@ -63,4 +106,173 @@ class AlertSystem:
             with open(log_file, 'a') as f:
                 f.write(json.dumps(alert_entry) + '\n')
         except Exception as e:
-            print(f"Failed to log alert: {e}")
\ No newline at end of file
+            print(f"Failed to log alert: {e}")
+
+
+_NUMBER = re.compile(r'[-+]?\d[\d.,]*(?:[eE][-+]?\d+)?')
+
+
+def alert_key(alert):
+    """Alerts differing only in their numbers count as repeats of each other."""
+    return _NUMBER.sub('#', alert)
+
+
+class AlertDispatcher:
+    """
+    Non-blocking alert delivery for an AlertSystem.
+
+    `submit` only enqueues.  A background thread wakes every
+    `flush_interval` seconds, appends everything submitted to the JSON-lines
+    log through one buffered file handle, drops repeats of an alert already
+    mailed within `dedupe_window` seconds (the next mail notes how many were
+    suppressed), and sends whatever is left as one coalesced email over a
+    single SMTP connection that is kept open and checked with NOOP before
+    reuse.  At most `max_emails` are sent per `rate_period` seconds; while
+    the budget is spent, alerts keep accumulating for the next email.
+    """
+
+    def __init__(self, alert_system, recipient_emails, log_file='alerts.json',
+                 flush_interval=5.0, dedupe_window=300.0, max_emails=10, rate_period=3600.0,
+                 max_queue=10000):
+        self.alert_system = alert_system
+        self.recipient_emails = list(recipient_emails)
+        self.flush_interval = flush_interval
+        self.dedupe_window = dedupe_window
+        self.max_emails = max_emails
+        self.rate_period = rate_period
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._log = open(log_file, 'a', buffering=1 << 16)
+        self._smtp = None
+        self._pending = {}                      # key → latest alert text, in arrival order
+        self._last_sent = {}                    # key → time it was last mailed
+        self._suppressed = {}                   # key → repeats dropped since
+        self._tokens = float(max_emails)
+        self._refilled = time.monotonic()
+        self.stats = {'submitted': 0, 'dropped': 0, 'suppressed': 0, 'emails': 0, 'send_errors': 0,
+                      'loop_errors': 0}
+        self._stats_lock = threading.Lock()     # updated from callers and the worker thread
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='alert-dispatcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, alerts):
+        """Queue alerts for delivery; never blocks (drops them if the queue is full)."""
+        if not alerts:
+            return
+        try:
+            self._queue.put_nowait((time.time(), [str(a) for a in alerts]))
+            self._count('submitted', len(alerts))
+        except queue.Full:
+            self._count('dropped', len(alerts))
+
+    def close(self, timeout=30):
+        """
+        Deliver everything still queued (one final email), then release the
+        connection and log.  Returns the number of alerts left undelivered
+        if that did not finish within `timeout` seconds.
+        """
+        self._stop.set()
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            return 0
+        undelivered = len(self._pending) + sum(len(alerts) for _, alerts in list(self._queue.queue))
+        print(f"Alert dispatcher did not finish within {timeout}s; "
+              f"{undelivered} alert(s) not yet delivered")
+        return undelivered
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self._safe_cycle()
+        self._safe_cycle(final=True)
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except smtplib.SMTPException:
+                pass
+            self._smtp = None
+        self._log.close()
+
+    def _safe_cycle(self, final=False):
+        # an unexpected error must not kill the thread and silence all later alerts
+        try:
+            self._cycle(final)
+        except Exception:
+            self._count('loop_errors')
+            print("Alert dispatcher error:")
+            traceback.print_exc()
+
+    def _cycle(self, final=False):
+        while True:
+            try:
+                ts, alerts = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._log.write(json.dumps({'timestamp': datetime.fromtimestamp(ts).isoformat(),
+                                        'alerts': alerts}) + '\n')
+            for alert in alerts:
+                self._accept(alert, ts)
+        self._log.flush()
+        if self._pending and (self._take_token() or final):
+            self._send()
+
+    def _accept(self, alert, ts):
+        key = alert_key(alert)
+        last = self._last_sent.get(key)
+        if key not in self._pending and last is not None and ts - last < self.dedupe_window:
+            self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            self._count('suppressed')
+            return
+        if key in self._pending:
+            self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            self._count('suppressed')
+        self._pending[key] = alert              # coalesce: keep the latest wording
+
+    def _take_token(self):
+        now = time.monotonic()
+        refill = (now - self._refilled) * self.max_emails / self.rate_period
+        self._tokens = min(self.max_emails, self._tokens + refill)
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _connection(self):
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+        self._smtp = self.alert_system.connect()
+        return self._smtp
+
+    def _send(self):
+        lines = []
+        for key, alert in self._pending.items():
+            n = self._suppressed.get(key, 0)
+            lines.append(f"{alert} (+{n} similar suppressed)" if n else alert)
+        msg = self.alert_system.build_message(lines, self.recipient_emails)
+        for attempt in range(2):                # one retry on a fresh connection
+            try:
+                self._connection().send_message(msg)
+                break
+            except (smtplib.SMTPException, OSError) as e:
+                self._smtp = None
+                if attempt:
+                    self._count('send_errors')
+                    print(f"Failed to send alert email: {e}")
+                    return                      # keep the alerts pending for the next cycle
+        now = time.time()
+        for key in self._pending:
+            self._last_sent[key] = now
+            self._suppressed.pop(key, None)
+        self._pending.clear()
+        self._count('emails')
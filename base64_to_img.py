@@ -1,17 +1,13 @@
-import io, os, base64, binascii, logging
+import io, os, json, base64, binascii, hashlib, logging, argparse, shutil
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
-from typing import Optional
+from typing import Collection, Dict, Iterator, List, Optional, Set, Tuple
 
 import pandas as pd
 from PIL import Image, UnidentifiedImageError
 
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(levelname)s | %(message)s"
-)
-
-
 def base64_to_image(b64_string: str) -> Optional[Image.Image]:
     """
     Convert a (possibly header-prefixed) base-64 string to a PIL Image.
@@ -33,32 +29,338 @@ def base64_to_image(b64_string: str) -> Optional[Image.Image]:
         return None
 
 
+FIRST_IMG_COL = 3                       # columns 3 … 8 (0-based) hold images
+N_IMG_COLS    = 6
+
+# (row index, file prefix, base-64 cells) — one CSV row as read from disk
+RowJob  = Tuple[int, str, Tuple[object, ...]]
+# (row index, column, output file name, base-64 cell, payload digest)
+CellJob = Tuple[int, int, str, object, str]
+
+
+def payload_digest(b64_string) -> Optional[str]:
+    """Content hash of a base-64 cell (header ignored); None if empty."""
+    if not isinstance(b64_string, str) or not b64_string.strip():
+        return None
+    if b64_string.startswith("data:"):
+        b64_string = b64_string.split(",", 1)[1]
+    return hashlib.blake2b(b64_string.strip().encode(), digest_size=16).hexdigest()
+
+
+def _replace_with(dest: Path, write) -> None:
+    """
+    Write `dest` through a temp file + os.replace.  Replacing (rather than
+    truncating) matters: `dest` may be a hard link shared with other outputs.
+    """
+    tmp = dest.with_name(f".{dest.name}.tmp")
+    try:
+        write(tmp)
+        os.replace(tmp, dest)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def _save_cell(idx: int, col: int, name: str, cell, out_dir: str) -> bool:
+    """Decode one cell and write it as `out_dir/name`; True if saved."""
+    img = base64_to_image(cell)
+
+    if img is None:
+        logging.info(f"row {idx} col {col}: skipped — empty/invalid")
+        return False
+
+    dest = Path(out_dir) / name
+    try:
+        _replace_with(dest, lambda tmp: img.save(tmp, format="PNG"))
+        logging.info(f"saved {dest}")
+        return True
+    except Exception as e:      # disk full, permission error, etc.
+        logging.warning(f"row {idx} col {col}: could not save ({e})")
+        return False
+
+
+def _link_or_copy(src: Path, dest: Path) -> None:
+    """Hard-link `dest` to `src`, falling back to a copy across devices."""
+    def write(tmp):
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copy2(src, tmp)
+    _replace_with(dest, write)
+
+
+# ─────────────────────────────
+# Incremental export manifest
+# ─────────────────────────────
+class DecodeManifest:
+    """
+    Persistent map of output file → digest of the base-64 payload it was
+    decoded from, stored as `<out_dir>/.manifest.json`.
+
+    Lets a re-run skip cells whose payload has not changed and point
+    identical glyphs (e.g. the same render under two vendors) at a single
+    file on disk via hard links.
+    """
+    FILE_NAME = ".manifest.json"
+
+    def __init__(self, out_dir: str, load: bool = True):
+        self.out_dir = Path(out_dir)
+        self.path = self.out_dir / self.FILE_NAME
+        self.files: Dict[str, str] = {}
+        self._by_digest: Dict[str, Set[str]] = {}
+
+        if load and self.path.exists():
+            try:
+                self.files = json.loads(self.path.read_text())["files"]
+            except (ValueError, KeyError) as e:
+                logging.warning(f"ignoring unreadable manifest {self.path} ({e})")
+        for name, digest in self.files.items():
+            self._by_digest.setdefault(digest, set()).add(name)
+
+    def unchanged(self, name: str, digest: str) -> bool:
+        return self.files.get(name) == digest and (self.out_dir / name).exists()
+
+    def source_for(self, digest: str, busy: Collection[str] = ()) -> Optional[str]:
+        """An existing output that already holds `digest`, if any (not one of `busy`)."""
+        for name in self._by_digest.get(digest, ()):
+            if name not in busy and (self.out_dir / name).exists():
+                return name
+        return None
+
+    def record(self, name: str, digest: str) -> None:
+        old = self.files.get(name)
+        if old is not None:
+            self._by_digest[old].discard(name)
+        self.files[name] = digest
+        self._by_digest.setdefault(digest, set()).add(name)
+
+    def save(self) -> None:
+        data = json.dumps({"files": self.files}, sort_keys=True)
+        _replace_with(self.path, lambda tmp: tmp.write_text(data))
+
+
+def plan_rows(
+    rows: List[RowJob],
+    manifest: DecodeManifest,
+    busy: Collection[str] = ()
+) -> Tuple[List[CellJob], List[Tuple[CellJob, str]], int]:
+    """
+    Split a chunk of rows into cells that must be decoded, cells that can
+    be hard-linked to an existing/pending output, and a count of unchanged
+    cells.  Outputs in `busy` are being rewritten by chunks still in
+    flight, so their manifest entries are stale and they are never used as
+    link sources.
+    """
+    decode, links, unchanged = [], [], 0
+    pending: Dict[str, str] = {}        # digest → output decoded in this chunk
+
+    for idx, name, cells in rows:
+        for offset, cell in enumerate(cells):
+            col = FIRST_IMG_COL + offset
+            job = (idx, col, f"{name}_{offset}.png", cell, payload_digest(cell))
+
+            if job[4] is None:
+                logging.info(f"row {idx} col {col}: skipped — empty/invalid")
+                continue
+            if manifest.unchanged(job[2], job[4]):
+                unchanged += 1
+                continue
+
+            src = pending.get(job[4]) or manifest.source_for(job[4], busy)
+            if src is not None and src != job[2]:
+                links.append((job, src))
+            else:
+                pending[job[4]] = job[2]
+                decode.append(job)
+
+    return decode, links, unchanged
+
+
+def _decode_jobs(jobs: List[CellJob], out_dir: str) -> List[Tuple[str, str]]:
+    """Worker entry point: decode/validate/save cells, return (name, digest)."""
+    return [(name, digest) for idx, col, name, cell, digest in jobs
+            if _save_cell(idx, col, name, cell, out_dir)]
+
+
+def _finish_chunk(
+    decoded: List[Tuple[str, str]],
+    links: List[Tuple[CellJob, str]],
+    out_dir: str,
+    manifest: DecodeManifest,
+    busy: Collection[str] = ()
+) -> int:
+    """
+    Record decoded cells, then materialise the hard links; returns #written.
+    A source in `busy` (being rewritten by another chunk) is not linked to;
+    the cell is decoded again instead.
+    """
+    written = len(decoded)
+    for name, digest in decoded:
+        manifest.record(name, digest)
+
+    for (idx, col, name, cell, digest), src in links:
+        # the source may have failed to decode or been rewritten meanwhile
+        if src not in busy and manifest.unchanged(src, digest):
+            try:
+                _link_or_copy(Path(out_dir) / src, Path(out_dir) / name)
+                logging.info(f"linked {name} -> {src}")
+            except OSError as e:
+                logging.warning(f"row {idx} col {col}: could not link ({e})")
+                continue
+        elif not _save_cell(idx, col, name, cell, out_dir):
+            continue
+        manifest.record(name, digest)
+        written += 1
+
+    return written
+
+
 def process_images(
     dataframe: pd.DataFrame,
     number_of_entries: int,
-    out_dir: str = "output"
+    out_dir: str = "output",
+    incremental: bool = True
 ):
-    """Save up to `number_of_entries` rows x 6 columns of base-64 images."""
+    """
+    Save up to `number_of_entries` rows x 6 columns of base-64 images.
+
+    With `incremental`, cells unchanged since the last run are skipped;
+    otherwise the manifest is rebuilt.  Duplicates are always hard-linked
+    (see `DecodeManifest`).
+    """
     Path(out_dir).mkdir(parents=True, exist_ok=True)
+    manifest = DecodeManifest(out_dir, load=incremental)
 
-    for idx, row in dataframe.iloc[:number_of_entries].iterrows():
-        name = str(row[1])              # second column → file prefix
+    rows = [
+        (idx, str(row.iloc[1]), tuple(row.iloc[FIRST_IMG_COL:FIRST_IMG_COL + N_IMG_COLS]))
+        for idx, row in dataframe.iloc[:number_of_entries].iterrows()
+    ]
+    decode, links, unchanged = plan_rows(rows, manifest)
+    written = _finish_chunk(_decode_jobs(decode, out_dir), links, out_dir, manifest)
 
-        for col in range(3, 9):         # columns 3 … 8 (0-based)
-            img = base64_to_image(row[col])
+    manifest.save()
+    logging.info(f"wrote {written} images, {unchanged} unchanged")
 
-            if img is None:
-                logging.info(f"row {idx} col {col}: skipped — empty/invalid")
-                continue
 
-            dest = Path(out_dir) / f"{name}_{col-3}.png"
-            try:
-                img.save(dest)
-                logging.info(f"saved {dest}")
-            except Exception as e:      # disk full, permission error, etc.
-                logging.warning(f"row {idx} col {col}: could not save ({e})")
+# ─────────────────────────────
+# Streaming mode
+# ─────────────────────────────
+def iter_row_chunks(
+    csv_path: str,
+    chunk_rows: int,
+    number_of_entries: Optional[int] = None
+) -> Iterator[List[RowJob]]:
+    """
+    Read `csv_path` lazily, `chunk_rows` rows at a time, yielding only the
+    columns the decoder needs so the full file is never held in memory.
+    """
+    img_cols = list(range(FIRST_IMG_COL, FIRST_IMG_COL + N_IMG_COLS))
+    reader = pd.read_csv(
+        csv_path,
+        usecols=[1] + img_cols,
+        chunksize=chunk_rows,
+        nrows=number_of_entries,
+    )
+    for chunk in reader:
+        names = chunk.iloc[:, 0].astype(str).tolist()
+        cells = chunk.iloc[:, 1:].itertuples(index=False, name=None)
+        yield [(idx, name, row) for idx, name, row in zip(chunk.index, names, cells)]
+
+
+def process_csv_streaming(
+    csv_path: str,
+    out_dir: str = "output",
+    number_of_entries: Optional[int] = None,
+    workers: Optional[int] = None,
+    chunk_rows: int = 256,
+    max_pending: Optional[int] = None,
+    incremental: bool = True
+) -> Tuple[int, int]:
+    """
+    Decode every image cell of `csv_path` on a process pool.
+
+    Chunks are read on demand and at most `max_pending` (default: 2 per
+    worker) are in flight at once, so peak memory is bounded by
+    `chunk_rows` rather than by the size of the CSV.  Planning against the
+    manifest and hard-linking happen in this process; workers only decode,
+    and outputs they have yet to write are never used as link sources.
+    Returns (images written, cells unchanged).
+    """
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    manifest = DecodeManifest(out_dir, load=incremental)
+
+    written = unchanged = 0
+    pending = {}                        # future → (names it decodes, link jobs of its chunk)
+    busy = Counter()                    # output name → in-flight chunks writing it
+
+    def collect(futures):
+        nonlocal written
+        for fut in futures:
+            names, links = pending.pop(fut)
+            for name in names:
+                busy[name] -= 1
+                if not busy[name]:
+                    del busy[name]
+            written += _finish_chunk(fut.result(), links, out_dir, manifest, busy)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for rows in iter_row_chunks(csv_path, chunk_rows, number_of_entries):
+                decode, links, skipped = plan_rows(rows, manifest, busy)
+                unchanged += skipped
+                if not decode and not links:
+                    continue
+
+                if len(pending) >= max_pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                names = [job[2] for job in decode]
+                busy.update(names)
+                pending[pool.submit(_decode_jobs, decode, out_dir)] = (names, links)
+
+            collect(list(pending))
+    finally:
+        manifest.save()
+
+    logging.info(f"wrote {written} images, {unchanged} unchanged, from {csv_path}")
+    return written, unchanged
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Decode base-64 emoji images from a CSV.")
+    p.add_argument("csv", nargs="?", default="old_emojis.csv")
+    p.add_argument("--out-dir", default="images")
+    p.add_argument("--entries", type=int, default=99,
+                   help="number of rows to export (0 = all)")
+    p.add_argument("--stream", action="store_true",
+                   help="read the CSV in chunks and decode on a process pool")
+    p.add_argument("--workers", type=int, default=None,
+                   help="decoder processes in --stream mode (default: all cores)")
+    p.add_argument("--chunk-rows", type=int, default=None,
+                   help="rows per chunk in --stream mode (default: 256)")
+    p.add_argument("--full", action="store_true",
+                   help="ignore the manifest, re-export every image and rebuild it")
+    return p.parse_args()
 
 
 if __name__ == "__main__":
-    df = pd.read_csv("old_emojis.csv")
-    process_images(df, number_of_entries=99, out_dir="images")
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(levelname)s | %(message)s"
+    )
+    args = parse_args()
+    entries = args.entries or None
+
+    # --workers / --chunk-rows only make sense when streaming
+    if args.stream or args.workers or args.chunk_rows:
+        process_csv_streaming(args.csv, out_dir=args.out_dir,
+                              number_of_entries=entries,
+                              workers=args.workers,
+                              chunk_rows=args.chunk_rows or 256,
+                              incremental=not args.full)
+    else:
+        df = pd.read_csv(args.csv)
+        process_images(df, number_of_entries=entries or len(df),
+                       out_dir=args.out_dir, incremental=not args.full)
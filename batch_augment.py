@@ -0,0 +1,110 @@
+# batch_augment.py
+"""
+Batched, tensor-level version of `train_emojis.train_tf`.
+
+Instead of running RandomRotation → RandomAffine → ColorJitter →
+GaussianBlur on one PIL image at a time inside the loader workers, the
+whole collated uint8 batch goes through:
+
+  * one `affine_grid`/`grid_sample` for rotation + translation + scale,
+  * vectorised brightness / contrast / saturation jitter,
+  * a per-sample 3×3 Gaussian blur as a single grouped convolution.
+
+Parameters default to the ones in `train_tf`.  Every sample draws its own
+random parameters, as with the per-sample pipeline; the one difference is
+that the colour-jitter order is fixed (brightness, contrast, saturation)
+rather than shuffled per image.
+"""
+import math
+from typing import Tuple
+
+import torch
+import torch.nn.functional as F
+from torch import nn
+
+_GRAY = (0.299, 0.587, 0.114)          # same weights as torchvision's rgb_to_grayscale
+
+
+def _uniform(n: int, lo: float, hi: float, device) -> torch.Tensor:
+    return torch.empty(n, device=device).uniform_(lo, hi)
+
+
+class BatchAugment(nn.Module):
+    def __init__(
+        self,
+        degrees: float = 12,
+        translate: Tuple[float, float] = (0.15, 0.15),
+        scale: Tuple[float, float] = (0.9, 1.25),
+        brightness: float = 0.2,
+        contrast: float = 0.2,
+        saturation: float = 0.2,
+        blur_sigma: Tuple[float, float] = (0.1, 1.5),
+        interpolation: str = "nearest"     # torchvision's default for both transforms
+    ):
+        super().__init__()
+        self.degrees = degrees
+        self.translate = translate
+        self.scale = scale
+        self.brightness = brightness
+        self.contrast = contrast
+        self.saturation = saturation
+        self.blur_sigma = blur_sigma
+        self.interpolation = interpolation
+
+    @torch.no_grad()
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        """(B, 3, H, W) uint8 or float in [0, 1] → augmented float in [0, 1]."""
+        if x.dtype == torch.uint8:
+            x = x.float().div_(255)
+        x = self.affine(x)
+        x = self.color_jitter(x)
+        return self.blur(x)
+
+    def affine(self, x: torch.Tensor) -> torch.Tensor:
+        b, dev = x.size(0), x.device
+        angle = _uniform(b, -self.degrees, self.degrees, dev) * (math.pi / 180)
+        s = _uniform(b, *self.scale, dev)
+        # translate is a fraction of the image size; the normalised grid spans 2
+        t = torch.stack([_uniform(b, -2 * self.translate[0], 2 * self.translate[0], dev),
+                         _uniform(b, -2 * self.translate[1], 2 * self.translate[1], dev)], 1)
+
+        # grid_sample maps output → input, so build the inverse of
+        # p_out = s·R(angle)·p_in + t, i.e. p_in = R(-angle)/s · (p_out - t)
+        cos, sin = torch.cos(angle) / s, torch.sin(angle) / s
+        A = torch.stack([torch.stack([cos, sin], 1),
+                         torch.stack([-sin, cos], 1)], 1)          # (B, 2, 2)
+        theta = torch.cat([A, -(A @ t.unsqueeze(2))], 2)            # (B, 2, 3)
+
+        grid = F.affine_grid(theta, list(x.shape), align_corners=False)
+        return F.grid_sample(x, grid, mode=self.interpolation,
+                             padding_mode="zeros", align_corners=False)
+
+    def color_jitter(self, x: torch.Tensor) -> torch.Tensor:
+        b, dev = x.size(0), x.device
+        gray_w = torch.tensor(_GRAY, device=dev, dtype=x.dtype).view(1, 3, 1, 1)
+
+        def factor(amount):
+            return _uniform(b, max(0.0, 1 - amount), 1 + amount, dev).view(b, 1, 1, 1)
+
+        x = (x * factor(self.brightness)).clamp_(0, 1)
+
+        mean = (x * gray_w).sum(1, keepdim=True).mean((2, 3), keepdim=True)
+        c = factor(self.contrast)
+        x = (c * x + (1 - c) * mean).clamp_(0, 1)
+
+        gray = (x * gray_w).sum(1, keepdim=True)
+        s = factor(self.saturation)
+        return (s * x + (1 - s) * gray).clamp_(0, 1)
+
+    def blur(self, x: torch.Tensor) -> torch.Tensor:
+        b, c, h, w = x.shape
+        sigma = _uniform(b, *self.blur_sigma, x.device).view(b, 1)
+        d = torch.tensor([-1.0, 0.0, 1.0], device=x.device, dtype=x.dtype)
+        k = torch.exp(-(d ** 2) / (2 * sigma ** 2))
+        k = (k / k.sum(1, keepdim=True)).repeat_interleave(c, 0)    # (B·C, 3)
+
+        # every (sample, channel) plane is its own group → one conv per axis
+        y = F.pad(x.reshape(1, b * c, h, w), (1, 1, 1, 1), mode="reflect")
+        y = F.conv2d(y, k.view(b * c, 1, 1, 3), groups=b * c)
+        y = F.conv2d(y, k.view(b * c, 1, 3, 1), groups=b * c)
+        return y.view(b, c, h, w)
@@ -0,0 +1,55 @@
+# bench_augment.py
+"""
+Images/sec of the per-sample PIL augmentation chain (`train_tf`) versus
+`BatchAugment` on collated uint8 batches.
+
+    python bench_augment.py --n 4096 --batch-size 64
+"""
+import time, argparse
+
+import numpy as np
+import torch
+from PIL import Image
+from torchvision import transforms
+
+from batch_augment import BatchAugment
+from train_emojis import IMG_SIZE, train_tf
+
+
+def make_images(n: int, size: int = IMG_SIZE):
+    rng = np.random.default_rng(0)
+    return [Image.fromarray(rng.integers(0, 256, (size, size, 3), dtype=np.uint8))
+            for _ in range(n)]
+
+
+def bench_per_sample(images, batch_size: int) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(images), batch_size):
+        torch.stack([train_tf(img) for img in images[i:i + batch_size]])
+    return len(images) / (time.perf_counter() - start)
+
+
+def bench_batched(images, batch_size: int) -> float:
+    augment, to_tensor = BatchAugment(), transforms.PILToTensor()
+    start = time.perf_counter()
+    for i in range(0, len(images), batch_size):
+        augment(torch.stack([to_tensor(img) for img in images[i:i + batch_size]]))
+    return len(images) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--n", type=int, default=4096, help="number of 72×72 images")
+    p.add_argument("--batch-size", type=int, default=64)
+    p.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    args = p.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    images = make_images(args.n)
+    bench_batched(images[:args.batch_size], args.batch_size)      # warm-up
+
+    per_sample = bench_per_sample(images, args.batch_size)
+    batched    = bench_batched(images, args.batch_size)
+    print(f"per-sample PIL : {per_sample:8.0f} img/s")
+    print(f"batched tensor : {batched:8.0f} img/s  ({batched / per_sample:.1f}x)")
@@ -0,0 +1,147 @@
+# checkpoints.py
+"""
+Crash-safe checkpointing and early stopping for train_emojis.py.
+
+    checkpoints/
+        last.pt               newest state, used to resume
+        best_epoch_007.pt     the `keep_best` highest-scoring epochs
+        index.json            scores of the kept best checkpoints and their classes
+
+Every file is written to a temp name and moved into place with
+os.replace, so a job killed mid-save never leaves a truncated checkpoint.
+"""
+import os, json, random
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import torch
+
+
+def capture_rng_state() -> Dict[str, Any]:
+    state = {"python": random.getstate(),
+             "numpy": np.random.get_state(),
+             "torch": torch.get_rng_state()}
+    if torch.cuda.is_available():
+        state["cuda"] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def restore_rng_state(state: Dict[str, Any]) -> None:
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    torch.set_rng_state(state["torch"])
+    if "cuda" in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state["cuda"])
+
+
+def atomic_save(obj, path: Path) -> None:
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "wb") as fh:
+        torch.save(obj, fh)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: Path, map_location="cpu") -> Dict[str, Any]:
+    # our own files: they carry RNG state, which weights_only cannot load
+    return torch.load(path, map_location=map_location, weights_only=False)
+
+
+class CheckpointManager:
+    """Keeps `last.pt` for resuming plus the `keep_best` best epochs by score."""
+
+    def __init__(self, ckpt_dir: Path = Path("checkpoints"), keep_best: int = 3,
+                 classes: Optional[List[str]] = None, resume: bool = True):
+        """
+        With `resume=False` the previous run's files are deleted.  Best
+        checkpoints recorded for a different `classes` list are ignored.
+        """
+        self.dir = Path(ckpt_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.keep_best = keep_best
+        self.classes = classes
+        self.index_path = self.dir / "index.json"
+        self.best: List[Dict[str, Any]] = []          # [{"epoch", "score", "file"}], best first
+        if not resume:
+            self.clear()
+        elif self.index_path.exists():
+            index = json.loads(self.index_path.read_text())
+            if classes is None or index.get("classes") == classes:
+                self.best = index["best"]
+
+    def clear(self) -> None:
+        """Delete last.pt, the best checkpoints and the index."""
+        for path in [self.last_path, self.index_path, *self.dir.glob("best_epoch_*.pt")]:
+            path.unlink(missing_ok=True)
+        self.best = []
+
+    @property
+    def last_path(self) -> Path:
+        return self.dir / "last.pt"
+
+    def latest(self) -> Optional[Path]:
+        return self.last_path if self.last_path.exists() else None
+
+    def best_path(self) -> Optional[Path]:
+        """Best checkpoint of this run's classes, if one exists."""
+        if not self.best:
+            return None
+        path = self.dir / self.best[0]["file"]
+        if not path.exists():
+            return None
+        if self.classes is not None and load_checkpoint(path)["classes"] != self.classes:
+            return None
+        return path
+
+    def save_last(self, state: Dict[str, Any]) -> Path:
+        atomic_save(state, self.last_path)
+        return self.last_path
+
+    def update_best(self, epoch: int, score: float, state: Dict[str, Any]) -> bool:
+        """Store `state` if `score` makes the top-k; prune what falls out."""
+        if self.keep_best <= 0:
+            return False
+        if len(self.best) >= self.keep_best and score <= self.best[-1]["score"]:
+            return False
+
+        entry = {"epoch": epoch, "score": score, "file": f"best_epoch_{epoch:03d}.pt"}
+        atomic_save(state, self.dir / entry["file"])
+        self.best = [b for b in self.best if b["epoch"] != epoch] + [entry]
+        self.best.sort(key=lambda b: b["score"], reverse=True)
+
+        for stale in self.best[self.keep_best:]:
+            (self.dir / stale["file"]).unlink(missing_ok=True)
+        self.best = self.best[:self.keep_best]
+
+        tmp = self.index_path.with_name(".index.json.tmp")
+        tmp.write_text(json.dumps({"best": self.best, "classes": self.classes}, indent=2))
+        os.replace(tmp, self.index_path)
+        return True
+
+
+class EarlyStopping:
+    """Stop once the monitored score has not improved by `min_delta` for `patience` epochs."""
+
+    def __init__(self, patience: int = 5, min_delta: float = 0.0):
+        self.patience = patience
+        self.min_delta = min_delta
+        self.best_score: Optional[float] = None
+        self.bad_epochs = 0
+
+    def step(self, score: float) -> bool:
+        if self.best_score is None or score > self.best_score + self.min_delta:
+            self.best_score = score
+            self.bad_epochs = 0
+        else:
+            self.bad_epochs += 1
+        return 0 < self.patience <= self.bad_epochs
+
+    def state_dict(self) -> Dict[str, Any]:
+        return {"best_score": self.best_score, "bad_epochs": self.bad_epochs}
+
+    def load_state_dict(self, state: Dict[str, Any]) -> None:
+        self.best_score = state["best_score"]
+        self.bad_epochs = state["bad_epochs"]
@@ -1,9 +1,14 @@
+from pathlib import Path
+
+import pandas as pd
 import tensorflow as tf
 
 IMG = 96
 BATCH = 64
+DATA_ROOT = Path("emoji_dataset")
+MANIFEST = DATA_ROOT / "manifest.csv"       # written by split_dataset.py
 
-train_gen = tf.keras.preprocessing.image.ImageDataGenerator(
+train_aug = tf.keras.preprocessing.image.ImageDataGenerator(
     rescale=1/255.,
     rotation_range=25,
     zoom_range=0.25,
@@ -12,19 +17,43 @@ train_gen = tf.keras.preprocessing.image.ImageDataGenerator(
     brightness_range=(0.7, 1.3),
     horizontal_flip=True,              # safe for many emojis
     fill_mode="nearest"
-).flow_from_directory(
-    "emoji_dataset/train",
-    target_size=(IMG, IMG),
-    batch_size=BATCH,
-    class_mode="categorical"
 )
-
-val_gen = tf.keras.preprocessing.image.ImageDataGenerator(
+val_aug = tf.keras.preprocessing.image.ImageDataGenerator(
     rescale=1/255.
-).flow_from_directory(
-    "emoji_dataset/val",
-    target_size=(IMG, IMG),
-    batch_size=BATCH,
-    class_mode="categorical",
-    shuffle=False
 )
+
+if MANIFEST.exists():
+    # read the split straight from the manifest — no per-split copies needed
+    manifest = pd.read_csv(MANIFEST)
+    manifest["path"] = [str(DATA_ROOT / p) for p in manifest["path"]]
+    classes = sorted(manifest.loc[manifest["split"] == "train", "label"].unique())
+
+    train_gen = train_aug.flow_from_dataframe(
+        manifest[manifest["split"] == "train"],
+        x_col="path", y_col="label", classes=classes,
+        target_size=(IMG, IMG),
+        batch_size=BATCH,
+        class_mode="categorical"
+    )
+    val_gen = val_aug.flow_from_dataframe(
+        manifest[manifest["split"] == "val"],
+        x_col="path", y_col="label", classes=classes,
+        target_size=(IMG, IMG),
+        batch_size=BATCH,
+        class_mode="categorical",
+        shuffle=False
+    )
+else:
+    train_gen = train_aug.flow_from_directory(
+        "emoji_dataset/train",
+        target_size=(IMG, IMG),
+        batch_size=BATCH,
+        class_mode="categorical"
+    )
+    val_gen = val_aug.flow_from_directory(
+        "emoji_dataset/val",
+        target_size=(IMG, IMG),
+        batch_size=BATCH,
+        class_mode="categorical",
+        shuffle=False
+    )
@@ -0,0 +1,232 @@
+# detect_emojis.py
+"""
+Screenshot → emoji code points.
+
+    1. propose candidate regions — a fast colour/contour pass (default) or a
+       YOLO model trained on emoji boxes — tile by tile, so large screenshots
+       are processed in parallel with bounded memory per tile;
+    2. merge the tile proposals with non-maximum suppression;
+    3. crop, square-pad and resize every region to 72×72; look each crop up
+       in the glyph hash index (if one is given) and classify the misses
+       with TinyEmojiNet in batched forward passes.
+
+    python detect_emojis.py screenshot.png --out screenshot_emojis.png
+"""
+import os, json, argparse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+import torch
+
+from emoji_classifier import EmojiClassifier
+
+Box = Tuple[int, int, int, int]        # x1, y1, x2, y2 in screenshot pixels
+
+TILE      = 1024
+OVERLAP   = 128                         # ≥ the largest emoji expected, so none is cut by every tile
+MIN_SIDE  = 12
+MAX_SIDE  = 256
+
+
+# ─────────────────────────────
+# Region proposals
+# ─────────────────────────────
+def propose_contours(
+    img: np.ndarray,
+    sat_thresh: int = 60,
+    min_side: int = MIN_SIDE,
+    max_side: int = MAX_SIDE
+) -> List[Box]:
+    """
+    Emoji are small, saturated blobs on mostly grey UI (text, backgrounds):
+    threshold saturation, close the gaps inside each glyph, and keep the
+    roughly square connected components of a plausible size.
+    """
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    mask = ((hsv[..., 1] > sat_thresh) & (hsv[..., 2] > 40)).astype(np.uint8)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((5, 5), np.uint8))
+
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    boxes = []
+    for c in contours:
+        x, y, w, h = cv2.boundingRect(c)
+        if not (min_side <= w <= max_side and min_side <= h <= max_side):
+            continue
+        if not 0.6 <= w / h <= 1.6:
+            continue
+        boxes.append((x, y, x + w, y + h))
+    return boxes
+
+
+def propose_yolo(imgs: List[np.ndarray], weights: str, conf: float = 0.25) -> List[List[Box]]:
+    """
+    Boxes from a YOLO model trained to localise emoji (any class), one
+    list per image.  All images go through one batched forward pass; the
+    shared model is not thread-safe, so never call this from several threads.
+    """
+    from yolov8 import YoloDetector        # optional: needs ultralytics
+    results = YoloDetector(weights, conf).detect(imgs)
+    return [[tuple(map(int, b)) for b in r.boxes.xyxy.tolist()] for r in results]
+
+
+def tile_grid(h: int, w: int, tile: int = TILE, overlap: int = OVERLAP) -> List[Box]:
+    step = max(1, tile - overlap)
+    ys = list(range(0, max(h - overlap, 1), step))
+    xs = list(range(0, max(w - overlap, 1), step))
+    return [(x, y, min(x + tile, w), min(y + tile, h)) for y in ys for x in xs]
+
+
+def nms(boxes: np.ndarray, iou_thresh: float = 0.5) -> np.ndarray:
+    """Greedy NMS preferring larger boxes (proposals carry no score)."""
+    if len(boxes) == 0:
+        return boxes
+    x1, y1, x2, y2 = boxes.T.astype(np.float64)
+    area = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-area)
+    keep = []
+    while order.size:
+        i, rest = order[0], order[1:]
+        keep.append(i)
+        iw = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        ih = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = iw * ih
+        iou = inter / (area[i] + area[rest] - inter)
+        # also drop boxes mostly contained in the kept one (tile-edge fragments)
+        order = rest[(iou <= iou_thresh) & (inter < 0.8 * area[rest])]
+    return boxes[keep]
+
+
+def propose_tiled(img: np.ndarray, propose, tile: int = TILE, overlap: int = OVERLAP,
+                  workers: Optional[int] = None, batched: bool = False) -> np.ndarray:
+    """
+    Run `propose` over overlapping tiles and NMS-merge.  `propose(tile_img)`
+    runs on a thread pool; with `batched`, `propose(tile_imgs)` gets all
+    tiles in one call and returns one box list per tile.
+    """
+    h, w = img.shape[:2]
+    grid = tile_grid(h, w, tile, overlap)
+    tiles = [img[y0:y1, x0:x1] for x0, y0, x1, y1 in grid]
+
+    if batched:
+        parts = propose(tiles)
+    elif len(grid) == 1:
+        parts = [propose(tiles[0])]
+    else:
+        # OpenCV releases the GIL, so threads scale across tiles
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            parts = list(pool.map(propose, tiles))
+
+    boxes = [(a + x0, b + y0, c + x0, d + y0)
+             for (x0, y0, _, _), part in zip(grid, parts)
+             for a, b, c, d in part]
+    return nms(np.array(boxes, dtype=np.int64).reshape(-1, 4))
+
+
+# ─────────────────────────────
+# Batched classification
+# ─────────────────────────────
+def crop_batch(img: np.ndarray, boxes: np.ndarray, size: int) -> np.ndarray:
+    """(N, size, size, 3) RGB uint8 crops; each box is padded to a square first."""
+    h, w = img.shape[:2]
+    out = np.empty((len(boxes), size, size, 3), dtype=np.uint8)
+    for i, (x1, y1, x2, y2) in enumerate(boxes):
+        side = max(x2 - x1, y2 - y1)
+        cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
+        sx1, sy1 = max(cx - side // 2, 0), max(cy - side // 2, 0)
+        crop = img[sy1:min(sy1 + side, h), sx1:min(sx1 + side, w)]
+        out[i] = cv2.resize(crop, (size, size), interpolation=cv2.INTER_AREA)[..., ::-1]
+    return out
+
+
+def classify_crops(classifier: EmojiClassifier, crops: np.ndarray,
+                   batch_size: int = 256) -> List[Dict]:
+    x = torch.from_numpy(crops).permute(0, 3, 1, 2).float().div_(255)
+    return [r for i in range(0, len(x), batch_size)
+            for r in classifier.classify_batch(x[i:i + batch_size])]
+
+
+def load_screenshot(screenshot: Union[str, Path, np.ndarray]) -> np.ndarray:
+    if isinstance(screenshot, np.ndarray):
+        return screenshot
+    img = cv2.imread(str(screenshot), cv2.IMREAD_COLOR)
+    if img is None:
+        raise FileNotFoundError(f"Cannot load image: {screenshot}")
+    return img
+
+
+def detect_emojis(
+    screenshot: Union[str, Path, np.ndarray],
+    classifier: Optional[EmojiClassifier] = None,
+    proposer: str = "contour",
+    yolo_weights: Optional[str] = None,
+    min_score: float = 0.5,
+    tile: int = TILE,
+    overlap: int = OVERLAP,
+    batch_size: int = 256,
+    workers: Optional[int] = None
+) -> List[Dict]:
+    """
+    Find and identify the emoji in a screenshot (path or BGR array).
+
+    Returns one dict per detection — unicode, emoji, score, top_k, source
+    ("hash" or "cnn") and box (x1, y1, x2, y2) — for detections scoring at
+    least `min_score`.
+    """
+    img = load_screenshot(screenshot)
+    if classifier is None:
+        classifier = EmojiClassifier(os.environ.get("EMOJI_MODEL", "emoji_cnn.ts"),
+                                     os.environ.get("EMOJI_GLYPH_INDEX"))
+
+    if proposer == "yolo":
+        if yolo_weights is None:
+            raise ValueError("proposer='yolo' needs yolo_weights")
+        propose = lambda tiles: propose_yolo(tiles, yolo_weights)
+    else:
+        propose = propose_contours
+
+    boxes = propose_tiled(img, propose, tile, overlap, workers, batched=proposer == "yolo")
+    crops = crop_batch(img, boxes, classifier.img_size)
+    results = classify_crops(classifier, crops, batch_size)
+
+    detections = []
+    for box, res in zip(boxes.tolist(), results):
+        if res["score"] >= min_score:
+            detections.append({**res, "box": box})
+    return detections
+
+
+def draw(img: np.ndarray, detections: List[Dict]) -> np.ndarray:
+    out = img.copy()
+    for d in detections:
+        x1, y1, x2, y2 = d["box"]
+        cv2.rectangle(out, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(out, f"{d['unicode']} {d['score']:.2f}", (x1, max(y1 - 6, 10)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 0), 1)
+    return out
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Print the unicode of every emoji in a screenshot.")
+    p.add_argument("screenshot")
+    p.add_argument("--model", default=os.environ.get("EMOJI_MODEL", "emoji_cnn.ts"))
+    p.add_argument("--glyph-index", default=os.environ.get("EMOJI_GLYPH_INDEX"),
+                   help="hash index from glyph_index.py; matches skip the CNN")
+    p.add_argument("--max-hash-distance", type=int, default=4)
+    p.add_argument("--proposer", choices=("contour", "yolo"), default="contour")
+    p.add_argument("--yolo-weights", default=None)
+    p.add_argument("--min-score", type=float, default=0.5)
+    p.add_argument("--tile", type=int, default=TILE)
+    p.add_argument("--out", default=None, help="write an annotated copy here")
+    args = p.parse_args()
+
+    img = load_screenshot(args.screenshot)
+    classifier = EmojiClassifier(args.model, args.glyph_index, args.max_hash_distance)
+    found = detect_emojis(img, classifier, args.proposer,
+                          args.yolo_weights, args.min_score, args.tile)
+    for d in found:
+        print(json.dumps({k: d[k] for k in ("unicode", "emoji", "score", "source", "box")}, ensure_ascii=False))
+    if args.out:
+        cv2.imwrite(args.out, draw(img, found))
@@ -0,0 +1,203 @@
+# drift.py
+"""
+Streaming drift detection against a fixed reference sample.
+
+Every monitored signal is reduced once, up front, to reference bin
+probabilities: numeric columns (input features, prediction confidence)
+are binned on the reference quantiles, categorical ones (predicted class)
+on the reference categories (nulls are their own "<NA>" category) plus
+an "other" bin.  Live batches are only
+binned and counted into a window made of `sub_windows` rotating
+histograms, so the current window slides without keeping any raw values.
+
+Scores — binned two-sample KS (with its asymptotic p-value) and the
+population stability index — are computed from the bin counts alone, so a
+check costs O(bins) no matter how much traffic the window has seen.
+"""
+from typing import Dict, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+CLASS_KEY = "__class__"
+CONFIDENCE_KEY = "__confidence__"
+NA_CATEGORY = "<NA>"
+_EPS = 1e-6
+
+
+class _NumericBins:
+    kind = "numeric"
+
+    def __init__(self, reference: np.ndarray, n_bins: int):
+        reference = np.asarray(reference, dtype=np.float64)
+        reference = reference[~np.isnan(reference)]
+        qs = np.linspace(0, 1, n_bins + 1)[1:-1]
+        # interior edges; repeated quantiles (discrete columns) collapse into one bin
+        self.edges = np.unique(np.quantile(reference, qs)) if reference.size else np.empty(0)
+        self.n_bins = len(self.edges) + 1
+        self.ref_counts = self.count(reference)
+
+    def count(self, values) -> np.ndarray:
+        v = np.asarray(values, dtype=np.float64).ravel()
+        v = v[~np.isnan(v)]
+        return np.bincount(np.searchsorted(self.edges, v, side="right"), minlength=self.n_bins)
+
+
+def _category_counts(values) -> Tuple[list, np.ndarray]:
+    # hashing, not sorting: works for mixed types and NaN, unlike np.unique
+    s = pd.Series(np.asarray(values, dtype=object).ravel())
+    counts = s.where(s.notna(), NA_CATEGORY).value_counts(sort=False)
+    return counts.index.tolist(), counts.to_numpy(dtype=np.int64)
+
+
+class _CategoricalBins:
+    kind = "categorical"
+
+    def __init__(self, reference: Sequence, max_categories: int = 1000):
+        cats, counts = _category_counts(reference)
+        keep = np.argsort(-counts, kind="stable")[:max_categories]
+        self.index = {cats[k]: i for i, k in enumerate(keep)}
+        self.n_bins = len(self.index) + 1           # last bin: categories unseen in the reference
+        self.ref_counts = self.count(reference)
+
+    def count(self, values) -> np.ndarray:
+        cats, counts = _category_counts(values)
+        idx = np.array([self.index.get(c, self.n_bins - 1) for c in cats], dtype=np.int64)
+        return np.bincount(idx, weights=counts, minlength=self.n_bins).astype(np.int64)
+
+
+_K = np.arange(1, 101)
+
+
+def ks_pvalue(statistic: float, n: int, m: int) -> float:
+    """Asymptotic two-sample KS p-value: the Kolmogorov survival function."""
+    lam = statistic * np.sqrt(n * m / (n + m)) if n and m else 0.0
+    if lam < 0.2:                               # series converges slowly; sf ≈ 1 here
+        return 1.0
+    terms = 2 * (-1.0) ** (_K - 1) * np.exp(-2 * _K ** 2 * lam ** 2)
+    return float(np.clip(terms.sum(), 0.0, 1.0))
+
+
+def compare_counts(ref: np.ndarray, cur: np.ndarray, ordered: bool = True) -> Dict:
+    """Drift scores of one signal from its reference and current bin counts."""
+    n, m = int(ref.sum()), int(cur.sum())
+    if not n or not m:
+        return {"statistic": 0.0, "p_value": 1.0 if ordered else None, "psi": 0.0, "n": m}
+    p, q = ref / n, cur / m
+    if ordered:
+        statistic = float(np.abs(np.cumsum(p) - np.cumsum(q)).max())
+    else:
+        statistic = float(0.5 * np.abs(p - q).sum())    # total variation distance
+    ps, qs = np.clip(p, _EPS, None), np.clip(q, _EPS, None)
+    return {
+        "statistic": statistic,
+        "p_value": ks_pvalue(statistic, n, m) if ordered else None,
+        "psi": float(((qs - ps) * np.log(qs / ps)).sum()),
+        "n": m,
+    }
+
+
+class StreamingDriftDetector:
+    def __init__(
+        self,
+        reference: Optional[Mapping] = None,
+        reference_labels: Optional[Sequence] = None,
+        reference_confidence: Optional[Sequence[float]] = None,
+        n_bins: int = 20,
+        window: int = 10000,
+        sub_windows: int = 10
+    ):
+        """
+        `reference` maps column → values (a DataFrame works); labels and
+        confidence are the classifier's outputs on the reference data.  The
+        current window holds roughly the last `window` observations.
+        """
+        self.signals = {}
+        if reference is not None:
+            for col in reference.keys():
+                values = np.asarray(reference[col])
+                if np.issubdtype(values.dtype, np.number):
+                    self.signals[col] = _NumericBins(values, n_bins)
+                else:
+                    self.signals[col] = _CategoricalBins(values)
+        if reference_labels is not None:
+            self.signals[CLASS_KEY] = _CategoricalBins(reference_labels)
+        if reference_confidence is not None:
+            self.signals[CONFIDENCE_KEY] = _NumericBins(reference_confidence, n_bins)
+
+        # one flat histogram per sub-window; signal i owns slice offsets[i]:offsets[i + 1]
+        sizes = [s.n_bins for s in self.signals.values()]
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        self.sub_size = max(1, window // sub_windows)
+        self._ring = np.zeros((sub_windows, self.offsets[-1]), dtype=np.int64)
+        self._ring_n = np.zeros(sub_windows, dtype=np.int64)   # observations per sub-window
+        self._window = np.zeros(self.offsets[-1], dtype=np.int64)
+        self._slot = 0
+
+    @property
+    def columns(self):
+        return [k for k in self.signals if k not in (CLASS_KEY, CONFIDENCE_KEY)]
+
+    def _slice(self, i: int) -> slice:
+        return slice(self.offsets[i], self.offsets[i + 1])
+
+    def _counts(self, features=None, labels=None, confidence=None) -> Tuple[np.ndarray, int]:
+        counts = np.zeros(self.offsets[-1], dtype=np.int64)
+        n = 0
+        for i, (key, bins) in enumerate(self.signals.items()):
+            if key == CLASS_KEY:
+                values = labels
+            elif key == CONFIDENCE_KEY:
+                values = confidence
+            else:
+                values = None if features is None or key not in features else features[key]
+            if values is not None:
+                c = bins.count(values)
+                counts[self._slice(i)] = c
+                n = max(n, int(c.sum()))
+        return counts, n
+
+    def update(self, features: Optional[Mapping] = None, labels: Optional[Sequence] = None,
+               confidence: Optional[Sequence[float]] = None) -> None:
+        """Count one batch of live inputs and/or classifier outputs into the window."""
+        counts, n = self._counts(features, labels, confidence)
+        if not n:
+            return
+        if self._ring_n[self._slot] >= self.sub_size:
+            # rotate: the oldest sub-window leaves the current window
+            self._slot = (self._slot + 1) % len(self._ring)
+            self._window -= self._ring[self._slot]
+            self._ring[self._slot] = 0
+            self._ring_n[self._slot] = 0
+        self._ring[self._slot] += counts
+        self._ring_n[self._slot] += n
+        self._window += counts
+
+    def reset(self) -> None:
+        self._ring[:] = 0
+        self._ring_n[:] = 0
+        self._window[:] = 0
+
+    def scores(self, current: Optional[np.ndarray] = None) -> Dict[str, Dict]:
+        """Per-signal drift scores of the current window (or of given bin counts)."""
+        current = self._window if current is None else current
+        return {
+            key: compare_counts(bins.ref_counts, current[self._slice(i)],
+                                ordered=bins.kind == "numeric")
+            for i, (key, bins) in enumerate(self.signals.items())
+        }
+
+    def compare(self, features: Optional[Mapping] = None, labels: Optional[Sequence] = None,
+                confidence: Optional[Sequence[float]] = None) -> Dict[str, Dict]:
+        """Scores of a standalone batch, leaving the window untouched."""
+        return self.scores(self._counts(features, labels, confidence)[0])
+
+    @staticmethod
+    def drifted(scores: Dict[str, Dict], threshold: float = 0.05,
+                psi_threshold: float = 0.2) -> Dict[str, Dict]:
+        """The signals whose KS p-value is below `threshold` or PSI above `psi_threshold`."""
+        return {
+            k: s for k, s in scores.items()
+            if s["n"] and ((s["p_value"] is not None and s["p_value"] < threshold)
+                           or s["psi"] > psi_threshold)
+        }
@@ -0,0 +1,116 @@
+# emoji_classifier.py
+"""
+Inference wrapper around the trained emoji CNN, shared by the API server
+and the screenshot pipeline.
+
+Loads either an exported TorchScript artifact (`emoji_cnn.ts`, see
+export_model.py) or the raw training checkpoint (`emoji_cnn.pt`), and
+turns a batch of PIL images into code points + scores with a single
+forward pass.  With a glyph index (see glyph_index.py) crops that are
+near-identical to a known vendor render are answered from the hash lookup
+and only the misses go through the model.
+"""
+import io
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import torch
+from PIL import Image, UnidentifiedImageError
+
+from base64_to_img import base64_to_image
+
+IMG_SIZE = 72
+
+
+def label_to_emoji(label: str) -> str:
+    """'U+1F600' → '😀'; multi code point labels ('U+1F1FA U+1F1F8') are joined."""
+    try:
+        return "".join(chr(int(cp[2:], 16)) for cp in label.split())
+    except ValueError:
+        return ""
+
+
+def decode_image(payload: Union[bytes, str]) -> Image.Image:
+    """Raw image bytes, or a base-64 string / data URL as found in emojis.csv."""
+    if isinstance(payload, str):
+        img = base64_to_image(payload)
+        if img is None:
+            raise ValueError("not a valid base-64 image")
+        return img
+    try:
+        return Image.open(io.BytesIO(payload))
+    except UnidentifiedImageError:
+        raise ValueError("not a valid image") from None
+
+
+class EmojiClassifier:
+    def __init__(self, model_path: Union[str, Path],
+                 glyph_index: Optional[Union[str, Path]] = None, max_hash_distance: int = 4):
+        model_path = Path(model_path)
+        if model_path.suffix == ".pt":
+            from export_model import load_trained     # pulls in the training module
+            self.model, self.classes = load_trained(model_path)
+            self.img_size = IMG_SIZE
+        else:
+            from export_model import load_torchscript
+            self.model, meta = load_torchscript(model_path)
+            self.classes, self.img_size = meta["classes"], meta["img_size"]
+        self.model_path = model_path
+        self.max_hash_distance = max_hash_distance
+        self.glyph_index = None
+        if glyph_index is not None:
+            from glyph_index import GlyphIndex
+            self.glyph_index = GlyphIndex.load(glyph_index)
+
+    def preprocess(self, img: Image.Image) -> torch.Tensor:
+        """Same input as training: RGB (default_loader), 72×72, float in [0, 1]."""
+        img = img.convert("RGB")
+        if img.size != (self.img_size, self.img_size):
+            img = img.resize((self.img_size, self.img_size), Image.BILINEAR)
+        x = torch.frombuffer(bytearray(img.tobytes()), dtype=torch.uint8)
+        return x.view(self.img_size, self.img_size, 3).permute(2, 0, 1).float().div_(255)
+
+    def predict_proba(self, batch: torch.Tensor) -> torch.Tensor:
+        """(N, 3, H, W) → (N, num_classes) probabilities, one forward pass."""
+        with torch.inference_mode():
+            return torch.softmax(self.model(batch).float(), dim=1)
+
+    def format(self, probs: torch.Tensor, top_k: int = 3) -> List[Dict]:
+        """Labels and scores for each row of `probs`, best first."""
+        scores, idx = probs.topk(min(top_k, probs.size(1)), dim=1)
+        results = []
+        for row_scores, row_idx in zip(scores.tolist(), idx.tolist()):
+            top = [{"unicode": self.classes[i],
+                    "emoji": label_to_emoji(self.classes[i]),
+                    "score": s} for s, i in zip(row_scores, row_idx)]
+            results.append({**top[0], "top_k": top})
+        return results
+
+    def lookup(self, batch: torch.Tensor) -> List[Optional[Dict]]:
+        """Hash-index answer for each row of `batch`, None where the CNN is needed."""
+        if self.glyph_index is None:
+            return [None] * len(batch)
+        results = []
+        for hit in self.glyph_index.match(batch, self.max_hash_distance):
+            if hit is None:
+                results.append(None)
+                continue
+            label, vendor, dist = hit
+            top = {"unicode": label, "emoji": label_to_emoji(label), "score": 1 - dist / 64}
+            results.append({**top, "top_k": [top], "vendor": vendor, "source": "hash"})
+        return results
+
+    def classify_batch(self, batch: torch.Tensor, top_k: int = 3) -> List[Dict]:
+        """Hash lookup first; one forward pass over the misses only."""
+        results = self.lookup(batch)
+        misses = [i for i, r in enumerate(results) if r is None]
+        if misses:
+            probs = self.predict_proba(batch[misses])
+            for i, r in zip(misses, self.format(probs, top_k)):
+                results[i] = {**r, "source": "cnn"}
+        return results
+
+    def classify(self, images: Sequence[Image.Image], top_k: int = 3) -> List[Dict]:
+        if not images:
+            return []
+        return self.classify_batch(torch.stack([self.preprocess(img) for img in images]), top_k)
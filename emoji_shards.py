@@ -0,0 +1,192 @@
+# emoji_shards.py
+"""
+Pack the `emoji_dataset/<split>/<class>/*.png` tree (or the split listed in
+`emoji_dataset/manifest.csv`) into one contiguous uint8 array per split, so
+training reads pixels straight out of a memory-mapped file instead of
+opening and PNG-decoding every image on every epoch.
+
+    emoji_shards/
+        classes.json          {"classes": [...], "img_size": 72}
+        train_images.npy      uint8 (N, 72, 72, 3)
+        train_labels.npy      int64 (N,)
+        val_images.npy / val_labels.npy
+"""
+import os, json, logging, argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+from PIL import Image
+from torch.utils.data import Dataset
+
+from split_dataset import MANIFEST, read_manifest
+
+SRC_ROOT   = Path("emoji_dataset")
+SHARD_ROOT = Path("emoji_shards")
+IMG_SIZE   = 72
+CHANNELS   = 3              # RGB, same as ImageFolder's default loader
+SPLITS     = ("train", "val")
+
+
+def images_path(root: Path, split: str) -> Path:
+    return Path(root) / f"{split}_images.npy"
+
+
+def labels_path(root: Path, split: str) -> Path:
+    return Path(root) / f"{split}_labels.npy"
+
+
+def list_split(split_dir: Path, classes: Sequence[str]) -> List[Tuple[Path, int]]:
+    """(file, label) pairs in ImageFolder order: sorted classes, sorted files."""
+    class_to_idx = {c: i for i, c in enumerate(classes)}
+    samples = []
+    for cls_dir in sorted(p for p in Path(split_dir).iterdir() if p.is_dir()):
+        if cls_dir.name not in class_to_idx:
+            logging.warning(f"{cls_dir}: class not in train split, skipped")
+            continue
+        label = class_to_idx[cls_dir.name]
+        samples += [(f, label) for f in sorted(cls_dir.glob("*.png"))]
+    return samples
+
+
+def list_manifest(manifest: Path, split: str, classes: Sequence[str]) -> List[Tuple[Path, int]]:
+    """(file, label) pairs of one split of split_dataset.py's manifest."""
+    class_to_idx = {c: i for i, c in enumerate(classes)}
+    return sorted((f, class_to_idx[c]) for f, c in read_manifest(manifest, split)
+                  if c in class_to_idx)
+
+
+def _load_pixels(path: Path, img_size: int) -> np.ndarray:
+    with Image.open(path) as img:
+        img = img.convert("RGB")
+        if img.size != (img_size, img_size):
+            img = img.resize((img_size, img_size), Image.BILINEAR)
+        return np.asarray(img, dtype=np.uint8)
+
+
+def _fill_range(out_path: str, files: List[Path], start: int, img_size: int) -> int:
+    """Worker entry point: decode `files` into rows [start, start+len) of the shard."""
+    shard = np.load(out_path, mmap_mode="r+")
+    for i, f in enumerate(files):
+        shard[start + i] = _load_pixels(f, img_size)
+    shard.flush()
+    return len(files)
+
+
+def build_split(
+    samples: List[Tuple[Path, int]],
+    out_root: Path,
+    split: str,
+    img_size: int = IMG_SIZE,
+    workers: Optional[int] = None,
+    block: int = 512
+) -> int:
+    """Write `<split>_images.npy` / `<split>_labels.npy` for `samples`."""
+    n = len(samples)
+    out = images_path(out_root, split)
+    tmp = out.with_name(f".{out.name}")
+
+    # pre-allocate the whole shard, then let workers fill disjoint row ranges
+    shard = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.uint8,
+                                      shape=(n, img_size, img_size, CHANNELS))
+    del shard
+
+    files = [f for f, _ in samples]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(_fill_range, str(tmp), files[i:i + block], i, img_size)
+                   for i in range(0, n, block)]
+        done = sum(f.result() for f in futures)
+
+    os.replace(tmp, out)
+    np.save(labels_path(out_root, split), np.array([l for _, l in samples], dtype=np.int64))
+    logging.info(f"{split}: packed {done} images into {out}")
+    return done
+
+
+def build_shards(
+    src_root: Path = SRC_ROOT,
+    out_root: Path = SHARD_ROOT,
+    img_size: int = IMG_SIZE,
+    workers: Optional[int] = None
+) -> List[str]:
+    """Pack every split under `src_root`; class indices follow the train split."""
+    src_root, out_root = Path(src_root), Path(out_root)
+    out_root.mkdir(parents=True, exist_ok=True)
+    manifest = src_root / MANIFEST
+
+    if manifest.exists():
+        classes = sorted({c for _, c in read_manifest(manifest, "train")})
+        for split in SPLITS:
+            build_split(list_manifest(manifest, split, classes),
+                        out_root, split, img_size, workers)
+    else:
+        classes = sorted(p.name for p in (src_root / "train").iterdir() if p.is_dir())
+        for split in SPLITS:
+            if (src_root / split).is_dir():
+                build_split(list_split(src_root / split, classes),
+                            out_root, split, img_size, workers)
+
+    (out_root / "classes.json").write_text(
+        json.dumps({"classes": classes, "img_size": img_size}))
+    return classes
+
+
+def shards_available(root: Path = SHARD_ROOT, splits: Sequence[str] = SPLITS) -> bool:
+    root = Path(root)
+    return (root / "classes.json").exists() and all(
+        images_path(root, s).exists() and labels_path(root, s).exists() for s in splits)
+
+
+class EmojiShardDataset(Dataset):
+    """
+    Map-style dataset over a packed split.
+
+    Samples are uint8 CHW tensors that view the memory-mapped shard
+    directly (no copy, no decode); `transform` must therefore accept
+    tensors, e.g. `transforms.ConvertImageDtype(torch.float)`.
+    The memmap is opened lazily so DataLoader workers each map the file
+    themselves instead of receiving a pickled copy of it.
+    """
+
+    def __init__(self, root: Path = SHARD_ROOT, split: str = "train", transform=None):
+        self.root, self.split = Path(root), split
+        self.transform = transform
+        meta = json.loads((self.root / "classes.json").read_text())
+        self.classes = meta["classes"]
+        self.class_to_idx = {c: i for i, c in enumerate(self.classes)}
+        self.targets = np.load(labels_path(self.root, split))
+        self._images = None
+
+    def __len__(self):
+        return len(self.targets)
+
+    @property
+    def images(self) -> np.ndarray:
+        if self._images is None:
+            # copy-on-write keeps torch.from_numpy happy without touching the file
+            self._images = np.load(images_path(self.root, self.split), mmap_mode="c")
+        return self._images
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_images"] = None
+        return state
+
+    def __getitem__(self, idx):
+        x = torch.from_numpy(self.images[idx]).permute(2, 0, 1)
+        if self.transform is not None:
+            x = self.transform(x)
+        return x, int(self.targets[idx])
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s | %(message)s")
+    p = argparse.ArgumentParser(description="Pack emoji_dataset/ into memory-mappable shards.")
+    p.add_argument("--src", type=Path, default=SRC_ROOT)
+    p.add_argument("--out", type=Path, default=SHARD_ROOT)
+    p.add_argument("--img-size", type=int, default=IMG_SIZE)
+    p.add_argument("--workers", type=int, default=None)
+    args = p.parse_args()
+    build_shards(args.src, args.out, args.img_size, args.workers)
@@ -0,0 +1,215 @@
+# export_model.py
+"""
+Turn the training checkpoint `emoji_cnn.pt` (state_dict + class list) into
+self-contained inference artifacts that need no import of train_emojis:
+
+    emoji_cnn.ts        frozen, inference-optimised TorchScript (fp32)
+    emoji_cnn.onnx      ONNX, dynamic batch axis          (needs `onnx`)
+    emoji_cnn_int8.ts   int8 TorchScript, --quantize dynamic|static
+
+Every artifact embeds its metadata (class names, input size) — TorchScript
+as the `meta.json` extra file, ONNX as `metadata_props`.  Input contract:
+float32 RGB in [0, 1], NCHW, 72×72.  Load TorchScript with
+`load_torchscript`.
+
+TinyEmojiNet has no BatchNorm to fold, so "fusion" here means Conv+ReLU:
+done by `optimize_for_inference` (at load time) for fp32 and by
+`fuse_modules` before static quantization, which is calibrated on the
+val split.
+"""
+import copy, json, time, argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import torch
+from torch import nn
+from torch.ao import quantization as tq
+from torch.utils.data import DataLoader
+
+from train_emojis import IMG_SIZE, TinyEmojiNet, build_datasets
+
+META_FILE = "meta.json"
+
+
+def load_trained(ckpt_path: Path) -> Tuple[TinyEmojiNet, List[str]]:
+    ckpt = torch.load(ckpt_path, map_location="cpu")
+    model = TinyEmojiNet(len(ckpt["classes"]))
+    model.load_state_dict(ckpt["model"])
+    return model.eval(), ckpt["classes"]
+
+
+def metadata(classes: List[str], **extra) -> Dict:
+    return {"classes": classes, "img_size": IMG_SIZE,
+            "input": "float32 RGB [0,1] NCHW", **extra}
+
+
+def load_torchscript(path: Path) -> Tuple[torch.jit.ScriptModule, Dict]:
+    """Load an artifact written by this script; returns (module, metadata)."""
+    files = {META_FILE: ""}
+    module = torch.jit.load(str(path), map_location="cpu", _extra_files=files).eval()
+    meta = json.loads(files[META_FILE])
+    if "quantization" not in meta:
+        module = torch.jit.optimize_for_inference(module)
+    return module, meta
+
+
+def save_torchscript(module: nn.Module, path: Path, meta: Dict, example: torch.Tensor,
+                     optimize: bool = True) -> torch.jit.ScriptModule:
+    """
+    Save a frozen trace of `module`.  The Conv+ReLU / oneDNN rewrites of
+    optimize_for_inference produce prepacked ops that cannot be serialised,
+    so they are applied here for the returned module and again on load.
+    """
+    with torch.inference_mode():
+        scripted = torch.jit.trace(module, example)
+    scripted = torch.jit.freeze(scripted.eval())
+    torch.jit.save(scripted, str(path), _extra_files={META_FILE: json.dumps(meta)})
+    return torch.jit.optimize_for_inference(scripted) if optimize else scripted
+
+
+def export_onnx(model: nn.Module, path: Path, meta: Dict, example: torch.Tensor) -> bool:
+    try:
+        import onnx
+    except ImportError:
+        print("⚠️  `onnx` is not installed — skipping the ONNX export")
+        return False
+
+    torch.onnx.export(model, (example,), str(path), dynamo=False,
+                      input_names=["image"], output_names=["logits"],
+                      dynamic_axes={"image": {0: "batch"}, "logits": {0: "batch"}})
+    proto = onnx.load(str(path))
+    for key, value in meta.items():
+        entry = proto.metadata_props.add()
+        entry.key, entry.value = key, json.dumps(value)
+    onnx.save(proto, str(path))
+    return True
+
+
+# ─────────────────────────────
+# int8 quantization
+# ─────────────────────────────
+class QuantizableEmojiNet(nn.Module):
+    """TinyEmojiNet with quant/dequant stubs and Conv+ReLU fused."""
+
+    def __init__(self, model: TinyEmojiNet):
+        super().__init__()
+        self.quant = tq.QuantStub()
+        self.features = copy.deepcopy(model.features)
+        self.classifier = copy.deepcopy(model.classifier)
+        self.dequant = tq.DeQuantStub()
+        tq.fuse_modules(self.features, [["0", "1"], ["3", "4"], ["6", "7"], ["9", "10"]],
+                        inplace=True)
+
+    def forward(self, x):
+        x = self.features(self.quant(x)).flatten(1)
+        return self.dequant(self.classifier(x))
+
+
+def quantize_dynamic(model: TinyEmojiNet) -> nn.Module:
+    # dynamic quantization only covers Linear layers — the convs stay fp32
+    return tq.quantize_dynamic(copy.deepcopy(model), {nn.Linear}, dtype=torch.qint8)
+
+
+def quantize_static(model: TinyEmojiNet, calib: DataLoader, batches: int,
+                    engine: str = "x86") -> nn.Module:
+    torch.backends.quantized.engine = engine
+    qmodel = QuantizableEmojiNet(model).eval()
+    qmodel.qconfig = tq.get_default_qconfig(engine)
+    tq.prepare(qmodel, inplace=True)
+    with torch.inference_mode():
+        for i, (X, _) in enumerate(calib):
+            if i >= batches:
+                break
+            qmodel(X)
+    return tq.convert(qmodel, inplace=True)
+
+
+# ─────────────────────────────
+# Latency / accuracy report
+# ─────────────────────────────
+def latency_ms(module, batch: int, runs: int = 50) -> float:
+    x = torch.rand(batch, 3, IMG_SIZE, IMG_SIZE)
+    times = []
+    with torch.inference_mode():
+        for _ in range(5):
+            module(x)
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            module(x)
+            times.append(time.perf_counter() - t0)
+    times.sort()
+    return 1000 * times[len(times) // 2]
+
+
+def accuracy(module, dl: Optional[DataLoader]) -> Optional[float]:
+    if dl is None:
+        return None
+    correct = total = 0
+    with torch.inference_mode():
+        for X, y in dl:
+            correct += (module(X).argmax(1) == y).sum().item()
+            total += y.size(0)
+    return correct / total if total else None
+
+
+def report(variants: Dict[str, nn.Module], val_dl: Optional[DataLoader]) -> None:
+    rows = [(name, latency_ms(m, 1), latency_ms(m, 64), accuracy(m, val_dl))
+            for name, m in variants.items()]
+    base_lat, base_acc = rows[0][2], rows[0][3]
+    print(f"{'variant':<16}{'bs=1 ms':>10}{'bs=64 ms':>10}{'speed-up':>10}{'val acc':>10}{'Δ acc':>9}")
+    for name, l1, l64, acc in rows:
+        acc_s   = "n/a" if acc is None else f"{acc:.2%}"
+        delta_s = "n/a" if acc is None or base_acc is None else f"{100 * (acc - base_acc):+.2f}pp"
+        print(f"{name:<16}{l1:>10.3f}{l64:>10.2f}{base_lat / l64:>9.2f}x{acc_s:>10}{delta_s:>9}")
+
+
+def val_loader() -> Optional[DataLoader]:
+    try:
+        _, val_ds = build_datasets()
+    except (FileNotFoundError, OSError):
+        return None
+    return DataLoader(val_ds, batch_size=64, shuffle=False)
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Export emoji_cnn.pt for inference.")
+    p.add_argument("--ckpt", type=Path, default=Path("emoji_cnn.pt"))
+    p.add_argument("--out-dir", type=Path, default=Path("."))
+    p.add_argument("--quantize", choices=("none", "dynamic", "static"), default="none")
+    p.add_argument("--calib-batches", type=int, default=32,
+                   help="val batches used to calibrate static quantization")
+    p.add_argument("--engine", default="x86", help="quantized backend (x86, fbgemm, qnnpack)")
+    p.add_argument("--no-onnx", action="store_true")
+    p.add_argument("--no-report", action="store_true")
+    args = p.parse_args()
+
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+    model, classes = load_trained(args.ckpt)
+    example = torch.rand(1, 3, IMG_SIZE, IMG_SIZE)
+    val_dl = val_loader()
+    variants = {"eager fp32": model}
+
+    ts_path = args.out_dir / "emoji_cnn.ts"
+    variants["torchscript fp32"] = save_torchscript(model, ts_path, metadata(classes), example)
+    print(f"✅ Saved {ts_path}")
+
+    if not args.no_onnx:
+        onnx_path = args.out_dir / "emoji_cnn.onnx"
+        if export_onnx(model, onnx_path, metadata(classes), example):
+            print(f"✅ Saved {onnx_path}")
+
+    if args.quantize != "none":
+        if args.quantize == "static":
+            if val_dl is None:
+                p.error("static quantization needs the val split for calibration")
+            qmodel = quantize_static(model, val_dl, args.calib_batches, args.engine)
+        else:
+            qmodel = quantize_dynamic(model)
+        q_path = args.out_dir / "emoji_cnn_int8.ts"
+        # quantized kernels are already fused; optimize_for_inference targets fp32 graphs
+        variants[f"int8 {args.quantize}"] = save_torchscript(
+            qmodel, q_path, metadata(classes, quantization=args.quantize), example, optimize=False)
+        print(f"✅ Saved {q_path}")
+
+    if not args.no_report:
+        report(variants, val_dl)
@@ -1,55 +1,155 @@
 # model_server.py
-from flask import Flask, request, jsonify
-import joblib
-import numpy as np
-import pandas as pd
+import os, queue, threading
 from datetime import datetime
+from pathlib import Path
+from flask import Flask, Response, request, jsonify
+
+import torch
+
+import metrics
+from emoji_classifier import EmojiClassifier, decode_image
+from micro_batcher import MicroBatcher
+from worker_counters import WorkerCounters
 
 app = Flask(__name__)
 
+DEFAULT_MODEL = "emoji_cnn.ts" if Path("emoji_cnn.ts").exists() else "emoji_cnn.pt"
+
 class ModelServer:
-    def __init__(self, model_path):
-        self.model = joblib.load(model_path)
-        self.last_prediction_time = None
-        self.prediction_count = 0
-    
-    def preprocess_input(self, data):
-        df = pd.DataFrame(data)
-        # Add preprocessing steps here
-        return df.values
-    
-    def predict(self, data):
-        processed_data = self.preprocess_input(data)
-        predictions = self.model.predict(processed_data)
-        probabilities = self.model.predict_proba(processed_data)
-        
-        self.prediction_count += 1
-        self.last_prediction_time = datetime.now()
-        
+    def __init__(self, model_path, max_batch_size=32, max_wait_ms=5.0, max_queue=1024,
+                 glyph_index=None):
+        self.model_path = model_path
+        self.glyph_index = glyph_index
+        self.batch_opts = dict(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms,
+                               max_queue=max_queue)
+        self.counters = WorkerCounters()
+        self.model = None
+        self.batcher = None
+        self._load_lock = threading.Lock()
+
+    def load(self):
+        """
+        Load the model and start the batcher thread.  Lazy, so a pre-fork
+        launcher (serve.py) can import this module in the parent and load
+        once per worker after fork.
+        """
+        with self._load_lock:
+            if self.model is None:
+                self.model = EmojiClassifier(self.model_path, self.glyph_index)
+                # concurrent requests are coalesced into one forward pass
+                self.batcher = MicroBatcher(self._forward, **self.batch_opts)
+        return self
+
+    @property
+    def prediction_count(self):
+        return self.counters.total
+
+    @property
+    def last_prediction_time(self):
+        return self.counters.last
+
+    def preprocess_input(self, payloads):
+        self.load()
+        # raw bytes or base-64 / data-URL strings → model-ready tensors,
+        # done on the request thread so the batcher only runs the model
+        with metrics.stage_timer('server', 'decode'):
+            images = [decode_image(p) for p in payloads]
+        with metrics.stage_timer('server', 'preprocess'):
+            return [self.model.preprocess(img) for img in images]
+
+    def _forward(self, tensors):
+        # one forward pass gives both the labels and their probabilities
+        return list(self.model.predict_proba(torch.stack(tensors)))
+
+    def predict(self, payloads, top_k=3, submit_timeout=1.0):
+        tensors = self.preprocess_input(payloads)
+        with metrics.stage_timer('server', 'inference'):
+            # known glyphs are answered by the hash index; only misses are batched
+            results = self.model.lookup(torch.stack(tensors))
+            misses = [i for i, r in enumerate(results) if r is None]
+            if misses:
+                # raises queue.Full when the inference queue stays saturated
+                probs = torch.stack(self.batcher.map([tensors[i] for i in misses],
+                                                     submit_timeout=submit_timeout))
+        if misses:
+            with metrics.stage_timer('server', 'postprocess'):
+                for i, r in zip(misses, self.model.format(probs, top_k=top_k)):
+                    results[i] = {**r, 'source': 'cnn'}
+        metrics.PREDICTIONS.labels('server', 'cnn').inc(len(misses))
+        metrics.PREDICTIONS.labels('server', 'hash').inc(len(results) - len(misses))
+
+        # this request's time, not the latest across all workers
+        predicted_at = datetime.fromtimestamp(self.counters.increment())
+
         return {
-            'predictions': predictions.tolist(),
-            'probabilities': probabilities.tolist(),
-            'timestamp': self.last_prediction_time.isoformat()
+            'predictions': results,
+            'timestamp': predicted_at.isoformat()
         }
 
-model_server = ModelServer('model.pkl')
+model_server = ModelServer(os.environ.get('EMOJI_MODEL', DEFAULT_MODEL),
+                           max_batch_size=int(os.environ.get('EMOJI_MAX_BATCH', 32)),
+                           max_wait_ms=float(os.environ.get('EMOJI_MAX_WAIT_MS', 5)),
+                           max_queue=int(os.environ.get('EMOJI_MAX_QUEUE', 1024)),
+                           glyph_index=os.environ.get('EMOJI_GLYPH_INDEX'))
+
+def request_payloads():
+    """Images from multipart files, a JSON body, or the raw request body."""
+    if request.files:
+        return [f.read() for key in request.files for f in request.files.getlist(key)]
+    if request.is_json:
+        data = request.get_json()
+        if isinstance(data, str):
+            return [data]
+        if isinstance(data, list):
+            return data
+        return data.get('images') or [data.get('image')]
+    return [request.get_data()]
 
 @app.route('/predict', methods=['POST'])
 def predict():
     try:
-        data = request.json
-        result = model_server.predict(data)
-        return jsonify(result)
+        payloads = request_payloads()
+        if not payloads or not all(payloads):
+            raise ValueError('no image in request')
+        top_k = int(request.args.get('top_k', 3))
+        result = model_server.predict(payloads, top_k=top_k)
+        with metrics.stage_timer('server', 'serialize'):
+            response = jsonify(result)
+        metrics.REQUESTS.labels('/predict', '200').inc()
+        return response
+    except queue.Full:
+        metrics.QUEUE_FULL.inc()
+        metrics.REQUESTS.labels('/predict', '503').inc()
+        return jsonify({'error': 'server busy, retry later'}), 503
     except Exception as e:
+        metrics.REQUESTS.labels('/predict', '400').inc()
         return jsonify({'error': str(e)}), 400
 
 @app.route('/health', methods=['GET'])
 def health():
+    last = model_server.last_prediction_time
     return jsonify({
         'status': 'healthy',
+        'model': str(model_server.model_path),
+        'worker_pid': os.getpid(),
+        # summed over all pre-forked workers
         'prediction_count': model_server.prediction_count,
-        'last_prediction': model_server.last_prediction_time
+        'prediction_count_per_worker': model_server.counters.per_worker(),
+        'last_prediction': last.isoformat() if last else None
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    # Prometheus scrape; summed over all workers under serve.py
+    body, content_type = metrics.render()
+    return Response(body, status=200 if metrics.AVAILABLE else 503, content_type=content_type)
+
+@app.route('/stats/batching', methods=['GET'])
+def batching_stats():
+    # batch-size and queue-time histograms of this worker's micro-batcher
+    return jsonify(model_server.load().batcher.stats())
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    # development server; use serve.py for the multi-worker production mode
+    model_server.load()
+    app.run(host='0.0.0.0', port=5000, debug=False)
@@ -0,0 +1,191 @@
+# glyph_index.py
+"""
+Perceptual-hash index of the vendor renders in emojis.csv / old_emojis.csv.
+
+Most crops seen in production are (near-)identical to one of those
+renders, so they can be resolved by a 64-bit pHash lookup instead of a CNN
+forward pass.  The index is a flat array of packed uint64 hashes searched
+with a vectorised XOR + popcount (Hamming distance); every glyph is stored
+three times — plain RGB (alpha dropped, as the model sees it), and
+composited over white and over black for light/dark screenshots.
+
+The pHash is computed on luma, so glyphs that differ only in colour (😠 and
+😡 in most vendor sets) hash alike; each entry also keeps the mean RGB of
+its four quadrants, and only entries within `max_colour_distance` of the
+crop's take part in the search.  A crop that is as close to some other
+label as to its best match is left to the CNN.
+
+    python glyph_index.py emojis.csv old_emojis.csv --out glyph_index.npz
+"""
+import argparse, logging
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn.functional as F
+from PIL import Image
+
+from base64_to_img import base64_to_image
+
+HASH_SIZE  = 32                         # DCT input is 32×32 …
+LOW_FREQ   = 8                          # … of which the 8×8 low frequencies give 64 bits
+IMG_SIZE   = 72
+COLOUR_GRID = 2                         # mean RGB of each quadrant, 12 bytes
+MAX_COLOUR_DISTANCE = 24                # largest per-channel difference (0-255) still matched
+NON_VENDOR = {"emoji", "unicode", "Description"}
+_GRAY      = torch.tensor([0.299, 0.587, 0.114]).view(1, 3, 1, 1)
+
+
+def _dct_matrix(n: int) -> torch.Tensor:
+    k = torch.arange(n, dtype=torch.float64).unsqueeze(1)
+    i = torch.arange(n, dtype=torch.float64).unsqueeze(0)
+    d = torch.cos(torch.pi * (2 * i + 1) * k / (2 * n)) * (2 / n) ** 0.5
+    d[0] /= 2 ** 0.5
+    return d.float()
+
+
+_DCT = _dct_matrix(HASH_SIZE)
+
+
+def phash(batch: torch.Tensor) -> np.ndarray:
+    """(N, 3, H, W) float RGB in [0, 1] → (N,) uint64 perceptual hashes."""
+    gray = (batch.float() * _GRAY).sum(1, keepdim=True)
+    small = F.adaptive_avg_pool2d(gray, HASH_SIZE).squeeze(1)          # (N, 32, 32)
+    coeffs = _DCT @ small @ _DCT.T
+    low = coeffs[:, :LOW_FREQ, :LOW_FREQ].reshape(len(batch), -1)
+    # median without the DC term, which would dominate
+    bits = (low > low[:, 1:].median(dim=1, keepdim=True).values).numpy()
+    return np.packbits(bits, axis=1).view(">u8").ravel().astype(np.uint64)
+
+
+def colour_signature(batch: torch.Tensor) -> np.ndarray:
+    """(N, 3, H, W) float RGB in [0, 1] → (N, 12) uint8 mean colour per quadrant."""
+    cells = F.adaptive_avg_pool2d(batch.float(), COLOUR_GRID).reshape(len(batch), -1)
+    return cells.mul(255).round().to(torch.uint8).numpy()
+
+
+if hasattr(np, "bitwise_count"):                    # numpy >= 2.0
+    def popcount(x: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(x)
+else:
+    _POP8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount(x: np.ndarray) -> np.ndarray:
+        return _POP8[x.view(np.uint8)].reshape(*x.shape, 8).sum(-1)
+
+
+def _to_tensor(img: Image.Image) -> torch.Tensor:
+    img = img.resize((IMG_SIZE, IMG_SIZE), Image.BILINEAR) if img.size != (IMG_SIZE, IMG_SIZE) else img
+    x = torch.frombuffer(bytearray(img.tobytes()), dtype=torch.uint8)
+    return x.view(IMG_SIZE, IMG_SIZE, 3).permute(2, 0, 1).float().div_(255)
+
+
+def glyph_variants(img: Image.Image) -> List[torch.Tensor]:
+    """The renderings of one glyph the index stores a hash for."""
+    rgba = img.convert("RGBA")
+    variants = [rgba.convert("RGB")]
+    for bg in ((255, 255, 255), (0, 0, 0)):
+        canvas = Image.new("RGBA", rgba.size, bg + (255,))
+        variants.append(Image.alpha_composite(canvas, rgba).convert("RGB"))
+    return [_to_tensor(v) for v in variants]
+
+
+class GlyphIndex:
+    def __init__(self, hashes: np.ndarray, colours: np.ndarray,
+                 labels: Sequence[str], vendors: Sequence[str]):
+        self.hashes = np.asarray(hashes, dtype=np.uint64)
+        self.colours = np.asarray(colours, dtype=np.uint8).reshape(len(self.hashes), 3 * COLOUR_GRID ** 2)
+        self.labels = np.asarray(labels)
+        self.vendors = np.asarray(vendors)
+        self._label_ids = np.unique(self.labels, return_inverse=True)[1].ravel()
+
+    def __len__(self):
+        return len(self.hashes)
+
+    @classmethod
+    def build(cls, csv_paths: Sequence[str], chunk_rows: int = 256) -> "GlyphIndex":
+        """Hash every base-64 render in the CSVs, streaming them chunk by chunk."""
+        hashes, colours, labels, vendors = [], [], [], []
+        for path in csv_paths:
+            for chunk in pd.read_csv(path, chunksize=chunk_rows):
+                vendor_cols = [c for c in chunk.columns
+                               if c not in NON_VENDOR and not c.startswith("Unnamed")]
+                batch, meta = [], []
+                for _, row in chunk.iterrows():
+                    for vendor in vendor_cols:
+                        img = base64_to_image(row[vendor])
+                        if img is None:
+                            continue
+                        variants = glyph_variants(img)
+                        batch += variants
+                        meta += [(str(row["unicode"]), vendor)] * len(variants)
+                if batch:
+                    batch = torch.stack(batch)
+                    hashes.append(phash(batch))
+                    colours.append(colour_signature(batch))
+                    labels += [m[0] for m in meta]
+                    vendors += [m[1] for m in meta]
+            logging.info(f"indexed {path}: {len(labels)} hashes so far")
+        if not hashes:
+            return cls(np.empty(0, np.uint64), np.empty(0, np.uint8), [], [])
+        return cls(np.concatenate(hashes), np.concatenate(colours), labels, vendors)
+
+    def save(self, path: Path) -> None:
+        np.savez(path, hashes=self.hashes, colours=self.colours, labels=self.labels, vendors=self.vendors)
+
+    @classmethod
+    def load(cls, path: Path) -> "GlyphIndex":
+        data = np.load(path, allow_pickle=False)
+        if "colours" not in data:
+            raise ValueError(f"{path} predates colour signatures; rebuild it with glyph_index.py")
+        return cls(data["hashes"], data["colours"], data["labels"], data["vendors"])
+
+    def query(self, hashes: np.ndarray, colours: np.ndarray,
+              max_colour_distance: int = MAX_COLOUR_DISTANCE,
+              block: int = 256) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Nearest colour-compatible indexed hash for every query: (index, Hamming
+        distance, distance to the nearest entry with a different label).
+        Distances are 65 where no entry is within `max_colour_distance`.
+        """
+        far = np.int64(65)
+        idx = np.zeros(len(hashes), dtype=np.int64)
+        dist = np.full(len(hashes), far)
+        rival = np.full(len(hashes), far)
+        colours = colours.astype(np.int16)
+        for i in range(0, len(hashes), block):
+            rows = np.arange(len(hashes[i:i + block]))
+            d = popcount(hashes[i:i + block, None] ^ self.hashes[None, :]).astype(np.int64)
+            dc = np.abs(colours[i:i + block, None] - self.colours[None].astype(np.int16)).max(-1)
+            d[dc > max_colour_distance] = far
+            best = d.argmin(1)
+            idx[i:i + block] = best
+            dist[i:i + block] = d[rows, best]
+            d[self._label_ids[None, :] == self._label_ids[best][:, None]] = far
+            rival[i:i + block] = d.min(1)
+        return idx, dist, rival
+
+    def match(self, batch: torch.Tensor, max_distance: int = 4,
+              max_colour_distance: int = MAX_COLOUR_DISTANCE) -> List[Optional[Tuple[str, str, int]]]:
+        """
+        (label, vendor, distance) for crops within `max_distance` bits of
+        exactly one label, else None.
+        """
+        if len(self) == 0 or len(batch) == 0:
+            return [None] * len(batch)
+        idx, dist, rival = self.query(phash(batch), colour_signature(batch), max_colour_distance)
+        return [(str(self.labels[i]), str(self.vendors[i]), int(d)) if d <= max_distance < r else None
+                for i, d, r in zip(idx, dist, rival)]
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s | %(message)s")
+    p = argparse.ArgumentParser(description="Build the perceptual-hash index of known emoji renders.")
+    p.add_argument("csvs", nargs="*", default=["emojis.csv", "old_emojis.csv"])
+    p.add_argument("--out", default="glyph_index.npz")
+    args = p.parse_args()
+
+    index = GlyphIndex.build(args.csvs)
+    index.save(args.out)
+    logging.info(f"saved {len(index)} hashes to {args.out}")
@@ -0,0 +1,112 @@
+# metrics.py
+"""
+Prometheus instrumentation shared by serving, training, monitoring and the
+YOLO tools.
+
+All latencies go into one histogram, `emoji_stage_seconds{component,stage}`
+(e.g. server/decode, server/inference, train/step, yolo/inference), so a
+single query shows where the time goes.  `prometheus_client` is optional:
+without it every metric is a no-op and `render()` reports that metrics are
+unavailable.
+
+Under the pre-fork server (serve.py) each worker writes its samples to
+PROMETHEUS_MULTIPROC_DIR and a scrape of any worker returns the sum over
+all of them.
+"""
+import os, time
+from contextlib import contextmanager
+from typing import Tuple
+
+try:
+    import prometheus_client
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, multiprocess
+    AVAILABLE = True
+except ImportError:
+    AVAILABLE = False
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Noop:
+    """Stands in for every metric (and its children) when prometheus_client is missing."""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+
+def _metric(cls_name, name, doc, labels=(), **kwargs):
+    if not AVAILABLE:
+        return _Noop()
+    if cls_name == "Gauge" and "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # one value per process otherwise; sum them like counters
+        kwargs.setdefault("multiprocess_mode", "livesum")
+    return getattr(prometheus_client, cls_name)(name, doc, labels, **kwargs)
+
+
+STAGE_SECONDS = _metric("Histogram", "emoji_stage_seconds", "Wall time per pipeline stage",
+                        ("component", "stage"), buckets=LATENCY_BUCKETS)
+PREDICTIONS = _metric("Counter", "emoji_predictions", "Images classified, by answer source",
+                      ("component", "source"))
+REQUESTS = _metric("Counter", "emoji_http_requests", "HTTP requests by endpoint and status",
+                   ("endpoint", "status"))
+QUEUE_FULL = _metric("Counter", "emoji_queue_full", "Requests rejected by a full inference queue")
+
+MEMORY_MB = _metric("Gauge", "emoji_process_memory_mb", "Process RSS sampled by the monitor")
+CPU_PERCENT = _metric("Gauge", "emoji_system_cpu_percent", "System CPU sampled by the monitor")
+DRIFT_PSI = _metric("Gauge", "emoji_drift_psi", "Population stability index per signal", ("signal",))
+DRIFT_KS = _metric("Gauge", "emoji_drift_ks_statistic", "Binned KS statistic per signal", ("signal",))
+
+EPOCH_LOSS = _metric("Gauge", "emoji_epoch_loss", "Loss of the last epoch", ("phase",))
+EPOCH_ACCURACY = _metric("Gauge", "emoji_epoch_accuracy", "Accuracy of the last epoch", ("phase",))
+EPOCH_THROUGHPUT = _metric("Gauge", "emoji_epoch_images_per_second",
+                           "Images/sec of the last epoch", ("phase",))
+
+
+def observe(component: str, stage: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(component, stage).observe(seconds)
+
+
+@contextmanager
+def stage_timer(component: str, stage: str):
+    """Time the `with` body into emoji_stage_seconds{component, stage}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(component, stage).observe(time.perf_counter() - start)
+
+
+def render() -> Tuple[bytes, str]:
+    """(body, content type) of a scrape of this process — or of all workers."""
+    if not AVAILABLE:
+        return b"# prometheus_client is not installed\n", "text/plain; charset=utf-8"
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def start_http_server(port: int) -> bool:
+    """Serve /metrics from a background thread (training, CLI tools)."""
+    if not AVAILABLE:
+        return False
+    prometheus_client.start_http_server(port)
+    return True
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop a dead worker's live gauges (multiprocess mode)."""
+    if AVAILABLE and "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,120 @@
+# micro_batcher.py
+"""
+Dynamic micro-batching: concurrent callers `submit()` single items, a
+background thread coalesces them into one batch of up to `max_batch_size`
+items — waiting at most `max_wait_ms` after the oldest queued item — runs
+`fn(batch)` once, and resolves each caller's Future with its own result.
+"""
+import queue, threading, time
+from bisect import bisect_left
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Sequence
+
+_STOP = object()
+
+
+class Histogram:
+    """Thread-safe cumulative histogram over fixed upper bounds (+Inf implied)."""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts, total, n = list(self.counts), self.sum, self.count
+        buckets, running = {}, 0
+        for bound, c in zip(self.bounds + ["+Inf"], counts):
+            running += c
+            buckets[str(bound)] = running
+        return {"buckets": buckets, "count": n, "sum": total,
+                "mean": total / n if n else 0.0}
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_queue: int = 1024
+    ):
+        """`fn` maps a list of items to a sequence of results of the same length."""
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self.queue_time_ms = Histogram([0.5, 1, 2, 5, 10, 25, 50, 100, 250, 1000])
+
+        self._thread = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any, timeout: float = None) -> Future:
+        """Queue one item; raises queue.Full if the queue stays full for `timeout`s."""
+        fut: Future = Future()
+        self._queue.put((item, fut, time.perf_counter()), timeout=timeout)
+        return fut
+
+    def map(self, items: Sequence[Any], timeout: float = None,
+            submit_timeout: float = None) -> List[Any]:
+        """Submit every item and wait for all results, in order."""
+        futures = [self.submit(item, submit_timeout) for item in items]
+        return [f.result(timeout) for f in futures]
+
+    def close(self) -> None:
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "queue_depth": self._queue.qsize(),
+                "batch_size": self.batch_sizes.snapshot(),
+                "queue_time_ms": self.queue_time_ms.snapshot()}
+
+    def _loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = first[2] + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    nxt = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is _STOP:
+                    self._queue.put(_STOP)      # finish this batch, then stop
+                    break
+                batch.append(nxt)
+            self._run(batch)
+
+    def _run(self, batch) -> None:
+        now = time.perf_counter()
+        for _, _, enqueued in batch:
+            self.queue_time_ms.observe((now - enqueued) * 1000)
+        self.batch_sizes.observe(len(batch))
+
+        futures = [fut for _, fut, _ in batch]
+        try:
+            results = self.fn([item for item, _, _ in batch])
+        except Exception as e:
+            for fut in futures:
+                fut.set_exception(e)
+            return
+        for fut, result in zip(futures, results):
+            fut.set_result(result)
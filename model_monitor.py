@@ -1,79 +1,387 @@
+import os
 import time
+import queue
+import atexit
+import weakref
 import psutil
 import logging
+import logging.handlers
+import threading
 from datetime import datetime
 import json
-import pandas as pd
+import numpy as np
+
+import metrics
+from drift import StreamingDriftDetector
+from sketches import QuantileSketch
+
+METRIC_DTYPE = np.dtype([
+    ('timestamp', 'f8'),                # unix seconds
+    ('prediction_time', 'f8'),
+    ('samples_processed', 'i8'),
+    ('samples_per_second', 'f8'),
+    ('memory_usage_mb', 'f8'),
+    ('cpu_percent', 'f8'),
+])
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+_PREDICT_SECONDS = metrics.STAGE_SECONDS.labels('monitor', 'predict')
+
+
+class MetricsRing:
+    """Fixed-capacity ring buffer of metric records; O(1) append, oldest overwritten."""
+
+    def __init__(self, capacity=10000, dtype=METRIC_DTYPE):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.size = 0
+        self._next = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, row):
+        """`row` is a tuple in dtype field order."""
+        self.data[self._next] = row
+        self._next = (self._next + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def records(self):
+        """All held records, oldest first (a copy)."""
+        if self.size < self.capacity:
+            return self.data[:self.size].copy()
+        return np.concatenate([self.data[self._next:], self.data[:self._next]])
+
+    def since(self, t0):
+        """Records with timestamp >= t0, oldest first."""
+        rec = self.records()
+        # timestamps are appended in order, so the window is a suffix
+        return rec[np.searchsorted(rec['timestamp'], t0, side='left'):]
+
+
+logger = logging.getLogger(__name__)
+_open_monitors = weakref.WeakSet()
+
+
+@atexit.register
+def _close_open_monitors():
+    # flush records still queued for the writer threads
+    for monitor in list(_open_monitors):
+        monitor.close()
+
+
+class SystemSampler:
+    """
+    Samples process memory and system CPU on a background thread, so the
+    prediction path only reads the latest values.
+    """
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self._process = psutil.Process()
+        psutil.cpu_percent()                    # prime: the first reading is meaningless
+        self.memory_usage_mb = self._process.memory_info().rss / 1024 / 1024
+        self.cpu_percent = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='system-sampler', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.memory_usage_mb = self._process.memory_info().rss / 1024 / 1024
+            # CPU utilisation since the previous sample
+            self.cpu_percent = psutil.cpu_percent()
+            metrics.MEMORY_MB.set(self.memory_usage_mb)
+            metrics.CPU_PERCENT.set(self.cpu_percent)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class _LogWriter(logging.handlers.QueueListener):
+    """
+    Writes queued log records on its own thread.  Per-prediction metrics are
+    queued as plain (unix time, dict) tuples — building the LogRecord and the
+    JSON happens here, off the prediction path.
+    """
+
+    def prepare(self, item):
+        if isinstance(item, tuple):
+            created, metrics = item
+            return logging.makeLogRecord({
+                'name': __name__, 'levelno': logging.INFO, 'levelname': 'INFO',
+                'msg': f"Performance metrics: {json.dumps(metrics)}",
+                'created': created, 'msecs': (created % 1) * 1000,
+            })
+        return item
+
+
+def _split_predictions(predictions):
+    """Labels, or class probabilities → (argmax labels, max probability)."""
+    if predictions is None:
+        return None, None
+    predictions = np.asarray(predictions)
+    if predictions.ndim == 2:
+        return predictions.argmax(1), predictions.max(1)
+    return predictions, None
+
+
+def _percentiles(values, qs=PERCENTILES):
+    if not len(values):
+        return {f'p{round(q * 100)}': None for q in qs}
+    return {f'p{round(q * 100)}': float(v) for q, v in zip(qs, np.quantile(values, qs))}
+
 
 class ModelPerformanceMonitor:
-    def __init__(self, log_file='model_performance.log'):
+    def __init__(self, log_file='model_performance.log', capacity=10000,
+                 windows=(60, 300, 3600), sample_interval=1.0):
         self.log_file = log_file
-        self.logger = self._setup_logger()
-        self.metrics_history = []
-    
-    def _setup_logger(self):
-        logging.basicConfig(
-            filename=self.log_file,
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s'
-        )
-        return logging.getLogger(__name__)
-    
-    def monitor_prediction_time(self, model, X_test):
-        start_time = time.time()
-        predictions = model.predict(X_test)
-        end_time = time.time()
-        
-        prediction_time = end_time - start_time
-        samples_per_second = len(X_test) / prediction_time
-        
+        self.logger = logger
+        self._setup_log_writer()
+        self.sampler = SystemSampler(sample_interval)
+        # bounded history for sliding-window reports ...
+        self.history = MetricsRing(capacity)
+        self.windows = windows
+        # ... and lifetime aggregates that never grow
+        self.latency_sketch = QuantileSketch()
+        self.throughput_sketch = QuantileSketch()
+        self._pending = []                      # sketch inputs, added in vectorised batches
+        self.total_calls = 0
+        self.total_samples = 0
+        self._sum_prediction_time = 0.0
+        self._sum_samples_per_second = 0.0
+        self._sum_cpu_percent = 0.0
+        self.max_memory_mb = 0.0
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.listeners = []                     # called with (metrics, unix time) per record
+        self.drift = None
+        self._drift_cache = (None, None)       # (reference_version, detector) of the last ad-hoc check
+        self._closed = False
+        _open_monitors.add(self)
+
+    def _setup_log_writer(self):
+        # records are queued on the caller's thread and formatted + written to
+        # the file by a listener thread, so logging never blocks a prediction
+        handler = logging.FileHandler(self.log_file)
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        self._log_queue = queue.SimpleQueue()
+        self._log_handler = logging.handlers.QueueHandler(self._log_queue)
+        self._log_writer = _LogWriter(self._log_queue, handler)
+        self._log_writer.start()
+
+    def _log(self, level, msg):
+        """Write `msg` to this monitor's log file (via the writer thread)."""
+        self._log_handler.handle(logger.makeRecord(logger.name, level, __file__, 0, msg, None, None))
+
+    def close(self):
+        """Stop the sampler thread and flush queued log records (also run at exit)."""
+        if self._closed:
+            return
+        self._closed = True
+        _open_monitors.discard(self)
+        self.sampler.close()
+        self._log_writer.stop()
+        for h in self._log_writer.handlers:
+            h.close()
+
+    @property
+    def metrics_history(self):
+        """The retained records as a list of dicts (the pre-ring-buffer format)."""
+        return [{
+            'timestamp': datetime.fromtimestamp(r['timestamp']).isoformat(),
+            'prediction_time': float(r['prediction_time']),
+            'samples_processed': int(r['samples_processed']),
+            'samples_per_second': float(r['samples_per_second']),
+            'memory_usage_mb': float(r['memory_usage_mb']),
+            'cpu_percent': float(r['cpu_percent']),
+        } for r in self.history.records()]
+
+    def record(self, prediction_time, samples_processed, memory_usage_mb=None, cpu_percent=None,
+               timestamp=None):
+        """Add one measurement; system figures default to the sampler's latest."""
+        timestamp = time.time() if timestamp is None else timestamp
+        if memory_usage_mb is None:
+            memory_usage_mb = self.sampler.memory_usage_mb
+        if cpu_percent is None:
+            cpu_percent = self.sampler.cpu_percent
+        samples_per_second = samples_processed / prediction_time if prediction_time > 0 else 0.0
+
+        self.history.append((timestamp, prediction_time, samples_processed,
+                             samples_per_second, memory_usage_mb, cpu_percent))
+        _PREDICT_SECONDS.observe(prediction_time)
+        self._pending.append((prediction_time, samples_per_second))
+        if len(self._pending) >= 1024:
+            self._flush_sketches()
+        self.total_calls += 1
+        self.total_samples += samples_processed
+        self._sum_prediction_time += prediction_time
+        self._sum_samples_per_second += samples_per_second
+        self._sum_cpu_percent += cpu_percent
+        self.max_memory_mb = max(self.max_memory_mb, memory_usage_mb)
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp
+        self.last_timestamp = timestamp
+
         metrics = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': datetime.fromtimestamp(timestamp).isoformat(),
             'prediction_time': prediction_time,
-            'samples_processed': len(X_test),
+            'samples_processed': samples_processed,
             'samples_per_second': samples_per_second,
-            'memory_usage_mb': psutil.Process().memory_info().rss / 1024 / 1024,
-            'cpu_percent': psutil.cpu_percent()
+            'memory_usage_mb': memory_usage_mb,
+            'cpu_percent': cpu_percent
         }
-        
-        self.metrics_history.append(metrics)
-        self.logger.info(f"Performance metrics: {json.dumps(metrics)}")
-        
+        for listener in self.listeners:
+            listener(metrics, timestamp)
+        return metrics
+
+    def add_listener(self, fn):
+        """Call `fn(metrics, timestamp)` on every record, e.g. an alert rule engine."""
+        self.listeners.append(fn)
+
+    def _flush_sketches(self):
+        if self._pending:
+            pending = np.array(self._pending)
+            self._pending.clear()
+            self.latency_sketch.add(pending[:, 0])
+            self.throughput_sketch.add(pending[:, 1])
+
+    def monitor_prediction_time(self, model, X_test):
+        start_ns = time.perf_counter_ns()
+        predictions = model.predict(X_test)
+        elapsed_ns = time.perf_counter_ns() - start_ns
+
+        now = time.time()
+        metrics = self.record(elapsed_ns / 1e9, len(X_test), timestamp=now)
+        self._log_queue.put((now, metrics))
+
+        if self.drift is not None:
+            self.observe(X_test, predictions)
+
         return predictions, metrics
-    
-    def check_model_drift(self, reference_data, current_data, threshold=0.05):
-        from scipy.stats import ks_2samp
-        
-        drift_detected = False
-        drift_scores = {}
-        
-        for col in reference_data.columns:
-            if col in current_data.columns:
-                statistic, p_value = ks_2samp(reference_data[col], current_data[col])
-                drift_scores[col] = {'statistic': statistic, 'p_value': p_value}
-                
-                if p_value < threshold:
-                    drift_detected = True
-                    self.logger.warning(f"Data drift detected in column {col}: p-value = {p_value}")
-        
-        return drift_detected, drift_scores
-    
+
+    def set_drift_reference(self, reference_data=None, reference_predictions=None, **kwargs):
+        """
+        Start streaming drift detection against a reference sample: feature
+        columns and/or the model's predictions on it (labels, or a 2-D array
+        of class probabilities, which also tracks confidence).
+        """
+        labels, confidence = _split_predictions(reference_predictions)
+        self.drift = StreamingDriftDetector(reference_data, labels, confidence, **kwargs)
+
+    def observe(self, features=None, predictions=None):
+        """Count a batch of live inputs and/or predictions into the drift window."""
+        labels, confidence = _split_predictions(predictions)
+        if not hasattr(features, 'keys'):
+            features = None                     # only column-addressable inputs are tracked
+        self.drift.update(features, labels, confidence)
+
+    def check_model_drift(self, reference_data=None, current_data=None, threshold=0.05,
+                          psi_threshold=0.2, reference_version=None):
+        """
+        Without arguments: score the streaming window against the reference
+        set with `set_drift_reference`.  With two DataFrames: compare them
+        directly.  The reference is binned on every call unless a
+        `reference_version` is given; its bins are then reused for as long
+        as the same version is passed, so change it whenever the reference
+        data changes.  KS is computed on the reference-quantile bins.
+        """
+        if reference_data is None:
+            if self.drift is None:
+                raise ValueError("no drift reference; call set_drift_reference first")
+            scores = self.drift.scores()
+        else:
+            version, detector = self._drift_cache
+            if reference_version is None or version != reference_version:
+                detector = StreamingDriftDetector(reference_data)
+                self._drift_cache = (reference_version, detector)
+            cols = [c for c in detector.columns if c in current_data.columns]
+            scores = {c: s for c, s in detector.compare(current_data[cols]).items() if c in cols}
+
+        for col, s in scores.items():
+            metrics.DRIFT_PSI.labels(col).set(s['psi'])
+            metrics.DRIFT_KS.labels(col).set(s['statistic'])
+
+        drifted = StreamingDriftDetector.drifted(scores, threshold, psi_threshold)
+        for col, s in drifted.items():
+            self._log(logging.WARNING, f"Data drift detected in column {col}: "
+                                       f"p-value = {s['p_value']}, PSI = {s['psi']:.3f}")
+
+        return bool(drifted), scores
+
+    def window_report(self, seconds, now=None):
+        """Percentiles over the records of the last `seconds` still held in the ring."""
+        now = time.time() if now is None else now
+        rec = self.history.since(now - seconds)
+        # the window really starts at the later of: its nominal start, the first
+        # record ever, and — once the ring has wrapped inside it — the oldest held one
+        start = max(now - seconds, self.first_timestamp or now)
+        truncated = len(rec) == self.history.capacity
+        if truncated:
+            start = max(start, rec['timestamp'][0])
+        elapsed = max(now - start, 1e-9)
+        return {
+            'calls': len(rec),
+            'truncated': bool(truncated),
+            'samples': int(rec['samples_processed'].sum()),
+            # samples served per wall-clock second over the window
+            'samples_per_second': float(rec['samples_processed'].sum() / elapsed),
+            'prediction_time': _percentiles(rec['prediction_time']),
+            'per_call_samples_per_second': _percentiles(rec['samples_per_second']),
+        }
+
     def generate_performance_report(self):
-        if not self.metrics_history:
+        if not self.total_calls:
             return "No performance data available"
-        
-        df = pd.DataFrame(self.metrics_history)
-        
+
+        self._flush_sketches()
+        n = self.total_calls
+        now = time.time()
+        lat = self.latency_sketch.quantiles(PERCENTILES)
+        thr = self.throughput_sketch.quantiles(PERCENTILES)
         report = {
-            'total_predictions': df['samples_processed'].sum(),
-            'avg_prediction_time': df['prediction_time'].mean(),
-            'avg_samples_per_second': df['samples_per_second'].mean(),
-            'max_memory_usage_mb': df['memory_usage_mb'].max(),
-            'avg_cpu_percent': df['cpu_percent'].mean(),
+            'total_predictions': self.total_samples,
+            'avg_prediction_time': self._sum_prediction_time / n,
+            'avg_samples_per_second': self._sum_samples_per_second / n,
+            'max_memory_usage_mb': self.max_memory_mb,
+            'avg_cpu_percent': self._sum_cpu_percent / n,
+            # lifetime percentiles from the streaming sketches (±1 % relative)
+            'prediction_time_percentiles': {f'p{round(q * 100)}': float(v) for q, v in zip(PERCENTILES, lat)},
+            'samples_per_second_percentiles': {f'p{round(q * 100)}': float(v) for q, v in zip(PERCENTILES, thr)},
+            'windows': {f'{w}s': self.window_report(w, now) for w in self.windows},
             'monitoring_period': {
-                'start': df['timestamp'].min(),
-                'end': df['timestamp'].max()
+                'start': datetime.fromtimestamp(self.first_timestamp).isoformat(),
+                'end': datetime.fromtimestamp(self.last_timestamp).isoformat()
             }
         }
-        
-        return report
\ No newline at end of file
+
+        return report
+
+
+def measure_overhead(n=100000, batch=32):
+    """Mean nanoseconds monitor_prediction_time adds to a no-op prediction."""
+    class Noop:
+        def predict(self, X):
+            return X
+
+    model, X = Noop(), list(range(batch))
+    monitor = ModelPerformanceMonitor(os.devnull, capacity=n)
+    try:
+        start = time.perf_counter_ns()
+        for _ in range(n):
+            model.predict(X)
+        bare = time.perf_counter_ns() - start
+
+        start = time.perf_counter_ns()
+        for _ in range(n):
+            monitor.monitor_prediction_time(model, X)
+        monitored = time.perf_counter_ns() - start
+    finally:
+        monitor.close()
+    return (monitored - bare) / n
+
+
+if __name__ == '__main__':
+    print(f"monitoring overhead: {measure_overhead() / 1000:.2f} µs per prediction")
@@ -1,52 +1,186 @@
+import warnings
 import pandas as pd
 import numpy as np
-from scipy import stats
+from typing import Dict, List, Mapping, Optional
+
+from sketches import QuantileSketch
+
+
+class ColumnMoments:
+    """
+    Count, mean, central moment sums (M2-M4), min and max of every numeric
+    column, plus a QuantileSketch per column.  Built in one vectorised pass
+    over a frame's numeric block and merged exactly across chunks or
+    workers (pairwise update of Chan et al. / Pébay).
+    """
+    
+    def __init__(self, columns: Optional[List[str]] = None, relative_accuracy: float = 0.01):
+        self.columns = list(columns or [])
+        self.relative_accuracy = relative_accuracy
+        k = len(self.columns)
+        self.n = np.zeros(k)
+        self.mean, self.m2, self.m3, self.m4 = (np.zeros(k) for _ in range(4))
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+        self.sketches = [QuantileSketch(relative_accuracy) for _ in range(k)]
+    
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, relative_accuracy: float = 0.01,
+                   sketches: bool = True) -> 'ColumnMoments':
+        numeric = df.select_dtypes(include=[np.number])
+        moments = cls(list(numeric.columns), relative_accuracy)
+        X = numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            moments.n = (~np.isnan(X)).sum(axis=0).astype(np.float64)
+            moments.mean = np.nansum(X, axis=0) / moments.n
+            d = X - moments.mean
+            d2 = d * d
+            moments.m2 = np.nansum(d2, axis=0)
+            moments.m3 = np.nansum(d2 * d, axis=0)
+            moments.m4 = np.nansum(d2 * d2, axis=0)
+        moments.mean = np.nan_to_num(moments.mean)
+        moments.min = np.fmin.reduce(X, axis=0, initial=np.inf)
+        moments.max = np.fmax.reduce(X, axis=0, initial=-np.inf)
+        if sketches:
+            for j, sketch in enumerate(moments.sketches):
+                sketch.add(X[:, j])
+        return moments
+    
+    def merge(self, other: 'ColumnMoments') -> 'ColumnMoments':
+        """Add `other`'s columns into these (in place; new columns are appended); returns self."""
+        new = [c for c in other.columns if c not in self.columns]
+        if new:
+            grown = ColumnMoments(self.columns + new, self.relative_accuracy)
+            k = len(self.columns)
+            for name in ('n', 'mean', 'm2', 'm3', 'm4', 'min', 'max'):
+                getattr(grown, name)[:k] = getattr(self, name)
+            grown.sketches[:k] = self.sketches
+            self.__dict__.update(grown.__dict__)
+        j = np.array([self.columns.index(c) for c in other.columns], dtype=np.int64)
+        
+        na, nb = self.n[j], other.n
+        n = na + nb
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = other.mean - self.mean[j]
+            ma2, mb2, ma3, mb3 = self.m2[j], other.m2, self.m3[j], other.m3
+            mean = self.mean[j] + delta * nb / n
+            m2 = ma2 + mb2 + delta ** 2 * na * nb / n
+            m3 = (ma3 + mb3 + delta ** 3 * na * nb * (na - nb) / n ** 2
+                  + 3 * delta * (na * mb2 - nb * ma2) / n)
+            m4 = (self.m4[j] + other.m4 + delta ** 4 * na * nb * (na ** 2 - na * nb + nb ** 2) / n ** 3
+                  + 6 * delta ** 2 * (na ** 2 * mb2 + nb ** 2 * ma2) / n ** 2
+                  + 4 * delta * (na * mb3 - nb * ma3) / n)
+        empty = n == 0
+        self.mean[j] = np.where(empty, 0.0, mean)
+        self.m2[j], self.m3[j], self.m4[j] = (np.where(empty, 0.0, m) for m in (m2, m3, m4))
+        self.n[j] = n
+        self.min[j] = np.fmin(self.min[j], other.min)
+        self.max[j] = np.fmax(self.max[j], other.max)
+        for i, sketch in zip(j, other.sketches):
+            self.sketches[i].merge(sketch)
+        return self
+    
+    def quantiles(self, qs: List[float]) -> np.ndarray:
+        """(columns, len(qs)) approximate quantiles from the sketches."""
+        return np.array([s.quantiles(qs) for s in self.sketches]).reshape(len(self.columns), len(qs))
+    
+    def distribution(self, medians: Optional[np.ndarray] = None) -> Dict[str, Dict]:
+        """
+        mean, median, std (ddof=1), skewness and excess kurtosis (both the
+        biased estimators, like scipy.stats defaults) per column.
+        """
+        if medians is None:
+            medians = self.quantiles([0.5])[:, 0]
+        n = self.n
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(n > 0, self.mean, np.nan)
+            std = np.sqrt(self.m2 / (n - 1))
+            skewness = np.sqrt(n) * self.m3 / self.m2 ** 1.5
+            kurtosis = n * self.m4 / self.m2 ** 2 - 3
+        std = np.where(n > 1, std, np.nan)
+        return {
+            col: {
+                'mean': mean[j],
+                'median': medians[j],
+                'std': std[j],
+                'skewness': skewness[j],
+                'kurtosis': kurtosis[j]
+            }
+            for j, col in enumerate(self.columns)
+        }
+
 
 class DataQualityMetrics:
-    def __init__(self):
+    def __init__(self, relative_accuracy: float = 0.01):
         self.metrics = {}
+        self.relative_accuracy = relative_accuracy
+        self.moments = ColumnMoments(relative_accuracy=relative_accuracy)   # of everything passed to update()
     
     def calculate_completeness(self, df: pd.DataFrame) -> Dict[str, float]:
+        return (df.count() / len(df) * 100).to_dict()
+    
+    def calculate_image_completeness(self, status: Mapping[str, Mapping[str, int]], rows: int) -> Dict[str, Dict[str, float]]:
+        """Per-vendor % of rows with an image cell at all, and with a well-formed one (ImageStats.status)."""
         completeness = {}
-        for col in df.columns:
-            completeness[col] = (df[col].count() / len(df)) * 100
+        for vendor, counts in status.items():
+            completeness[vendor] = {
+                'present': (rows - counts.get('missing', 0)) / rows * 100 if rows else 0.0,
+                'valid': counts.get('ok', 0) / rows * 100 if rows else 0.0
+            }
         return completeness
     
     def calculate_uniqueness(self, df: pd.DataFrame) -> Dict[str, float]:
-        uniqueness = {}
-        for col in df.columns:
-            if df[col].dtype in ['object', 'string']:
-                unique_ratio = (df[col].nunique() / df[col].count()) * 100
-                uniqueness[col] = unique_ratio
-        return uniqueness
+        text_cols = [col for col in df.columns if df[col].dtype in ['object', 'string']]
+        return (df[text_cols].nunique() / df[text_cols].count() * 100).to_dict()
     
     def detect_outliers(self, df: pd.DataFrame) -> Dict[str, int]:
-        outliers = {}
-        numeric_cols = df.select_dtypes(include=[np.number]).columns
+        numeric = df.select_dtypes(include=[np.number])
+        X = numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+        if not X.size:
+            return {col: 0 for col in numeric.columns}
         
-        for col in numeric_cols:
-            Q1 = df[col].quantile(0.25)
-            Q3 = df[col].quantile(0.75)
-            IQR = Q3 - Q1
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-            outlier_count = ((df[col] < lower_bound) | (df[col] > upper_bound)).sum()
-            outliers[col] = outlier_count
-        
-        return outliers
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)     # all-NaN columns: no outliers
+            Q1, Q3 = np.nanquantile(X, [0.25, 0.75], axis=0)
+        IQR = Q3 - Q1
+        with np.errstate(invalid='ignore'):
+            outlier_counts = ((X < Q1 - 1.5 * IQR) | (X > Q3 + 1.5 * IQR)).sum(axis=0)
+        return dict(zip(numeric.columns, outlier_counts.tolist()))
     
     def calculate_distribution_metrics(self, df: pd.DataFrame) -> Dict[str, Dict]:
-        distribution_metrics = {}
-        numeric_cols = df.select_dtypes(include=[np.number]).columns
-        
-        for col in numeric_cols:
-            metrics = {
-                'mean': df[col].mean(),
-                'median': df[col].median(),
-                'std': df[col].std(),
-                'skewness': stats.skew(df[col].dropna()),
-                'kurtosis': stats.kurtosis(df[col].dropna())
-            }
-            distribution_metrics[col] = metrics
-        
-        return distribution_metrics
\ No newline at end of file
+        moments = ColumnMoments.from_frame(df, sketches=False)
+        X = df[moments.columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        medians = np.full(len(moments.columns), np.nan)
+        present = moments.n > 0
+        if X.size and present.any():
+            medians[present] = np.nanmedian(X[:, present], axis=0)
+        return moments.distribution(medians)
+    
+    # Streaming profile: feed chunks (or merge per-worker instances), then
+    # read approximate metrics without ever holding the whole table.
+    
+    def update(self, df: pd.DataFrame) -> None:
+        self.moments.merge(ColumnMoments.from_frame(df, self.relative_accuracy))
+    
+    def merge(self, other: 'DataQualityMetrics') -> 'DataQualityMetrics':
+        self.moments.merge(other.moments)
+        return self
+    
+    def streaming_distribution_metrics(self) -> Dict[str, Dict]:
+        """calculate_distribution_metrics of everything updated so far (median from the sketch)."""
+        return self.moments.distribution()
+    
+    def streaming_outliers(self) -> Dict[str, int]:
+        """Approximate detect_outliers of everything updated so far, from the sketches."""
+        outliers = {}
+        for col, sketch in zip(self.moments.columns, self.moments.sketches):
+            if not sketch.count:
+                outliers[col] = 0
+                continue
+            Q1, Q3 = sketch.quantiles([0.25, 0.75])
+            IQR = Q3 - Q1
+            # strictly outside the fences, as in detect_outliers
+            below = sketch.cdf([Q1 - 1.5 * IQR], side="left")[0]
+            upto = sketch.cdf([Q3 + 1.5 * IQR])[0]
+            outliers[col] = int(round(sketch.count * (below + 1 - upto)))
+        return outliers
@@ -0,0 +1,144 @@
+# serve.py
+"""
+Pre-fork production launcher for flaskAPI.
+
+The parent binds the listening socket and forks `--workers` processes.
+Each worker loads the model once, runs a threaded WSGI server on the
+shared socket (the kernel spreads connections across workers), and feeds
+inference through its own bounded micro-batcher — a full queue answers
+503 instead of piling up threads.  Prediction counters live in shared
+memory, so /health reports the total over all workers.  Dead workers are
+restarted, with a growing delay while one keeps dying right after start;
+a slot is given up after MAX_FAST_FAILURES such crashes in a row.
+SIGINT/SIGTERM stops them all.  Prometheus samples are written to
+PROMETHEUS_MULTIPROC_DIR (a fresh temp dir unless set), so /metrics on
+any worker reports all of them.
+
+    python serve.py --workers 4 --port 5000
+"""
+import os, time, signal, socket, shutil, argparse, tempfile, traceback
+
+import torch
+from werkzeug.serving import make_server
+
+from worker_counters import WorkerCounters
+
+MIN_UPTIME        = 10.0    # seconds; a worker dying sooner counts as a failed start
+MAX_FAST_FAILURES = 5       # failed starts in a row before a slot is given up
+MAX_BACKOFF       = 30.0    # seconds
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def run_worker(slot: int, sock: socket.socket, host: str, port: int, threads: int) -> None:
+    from flaskAPI import app, model_server      # already imported by main(), before the fork
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    torch.set_num_threads(threads)
+    model_server.counters.bind(slot)
+    model_server.load()                 # one model per worker, after fork
+
+    server = make_server(host, port, app, threaded=True, fd=sock.fileno())
+    print(f"worker {slot} (pid {os.getpid()}) serving on {host}:{port}", flush=True)
+    server.serve_forever()
+
+
+def spawn(slot: int, sock, args, threads: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(slot, sock, args.host, args.port, threads)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main():
+    p = argparse.ArgumentParser(description="Multi-worker emoji classification server.")
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=5000)
+    p.add_argument("--workers", type=int, default=None, help="default: one per 2 cores")
+    args = p.parse_args()
+
+    # must be set before prometheus_client is first imported (via flaskAPI → metrics)
+    own_metrics_dir = None
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        own_metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="emoji-metrics-")
+    import metrics
+    from flaskAPI import model_server
+
+    cores = available_cores()
+    workers = args.workers or max(1, cores // 2)
+    threads = max(1, cores // workers)          # torch intra-op threads per worker
+
+    # shared-memory counters must exist before the fork
+    model_server.counters = WorkerCounters(workers)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(1024)
+    sock.set_inheritable(True)
+
+    children = {spawn(slot, sock, args, threads): slot for slot in range(workers)}
+    started = {slot: time.monotonic() for slot in range(workers)}
+    failures = dict.fromkeys(range(workers), 0)   # consecutive failed starts per slot
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        slot = children.pop(pid, None)
+        metrics.mark_process_dead(pid)
+        if slot is None or stopping:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        if time.monotonic() - started[slot] < MIN_UPTIME:
+            failures[slot] += 1
+        else:
+            failures[slot] = 0
+        if failures[slot] >= MAX_FAST_FAILURES:
+            print(f"worker {slot} (pid {pid}) exited with status {code}; "
+                  f"{failures[slot]} failed starts in a row, giving up on this slot", flush=True)
+            continue
+        delay = min(MAX_BACKOFF, 2 ** failures[slot] - 1)
+        print(f"worker {slot} (pid {pid}) exited with status {code}; "
+              f"restarting in {delay:g}s", flush=True)
+        time.sleep(delay)
+        if not stopping:
+            started[slot] = time.monotonic()
+            children[spawn(slot, sock, args, threads)] = slot
+
+    if own_metrics_dir:
+        shutil.rmtree(own_metrics_dir, ignore_errors=True)
+    if not stopping:
+        raise SystemExit("all workers failed to start")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# sketches.py
+"""
+Mergeable streaming quantile sketch (DDSketch-style).
+
+Values are counted in logarithmic buckets whose width is a fixed fraction
+of their value, so every quantile is returned with a bounded *relative*
+error (`relative_accuracy`, 1 % by default) using memory proportional to
+the log of the value range — not to the number of values seen.  Sketches
+built on different workers or data chunks merge exactly by adding bucket
+counts.
+"""
+import math
+from typing import Iterable, Sequence, Union
+
+import numpy as np
+
+
+class _Store:
+    """Dense bucket counts for a contiguous range of bucket indices."""
+
+    def __init__(self):
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.offset = 0                         # bucket index of counts[0]
+
+    def _extend(self, lo: int, hi: int) -> None:
+        if not len(self.counts):
+            self.counts = np.zeros(hi - lo + 1, dtype=np.int64)
+            self.offset = lo
+            return
+        cur_hi = self.offset + len(self.counts) - 1
+        if lo >= self.offset and hi <= cur_hi:
+            return
+        new_lo, new_hi = min(lo, self.offset), max(hi, cur_hi)
+        grown = np.zeros(new_hi - new_lo + 1, dtype=np.int64)
+        start = self.offset - new_lo
+        grown[start:start + len(self.counts)] = self.counts
+        self.counts, self.offset = grown, new_lo
+
+    def add(self, idx: np.ndarray) -> None:
+        if not len(idx):
+            return
+        lo, hi = int(idx.min()), int(idx.max())
+        self._extend(lo, hi)
+        start = lo - self.offset
+        self.counts[start:start + hi - lo + 1] += np.bincount(idx - lo, minlength=hi - lo + 1)
+
+    def merge(self, other: "_Store") -> None:
+        if not len(other.counts):
+            return
+        self._extend(other.offset, other.offset + len(other.counts) - 1)
+        start = other.offset - self.offset
+        self.counts[start:start + len(other.counts)] += other.counts
+
+    def indices(self) -> np.ndarray:
+        return np.arange(self.offset, self.offset + len(self.counts))
+
+
+class QuantileSketch:
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-9):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value              # |x| below this counts as zero
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._pos, self._neg = _Store(), _Store()
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, values: Union[float, Iterable[float], np.ndarray]) -> None:
+        """Add one value or an array of values (NaNs are ignored)."""
+        v = np.asarray(values, dtype=np.float64).ravel()
+        v = v[~np.isnan(v)]
+        if not v.size:
+            return
+        self.count += v.size
+        self.sum += float(v.sum())
+        self.min = min(self.min, float(v.min()))
+        self.max = max(self.max, float(v.max()))
+        pos, neg = v[v > self.min_value], -v[v < -self.min_value]
+        self.zero_count += v.size - pos.size - neg.size
+        self._pos.add(self._index(pos))
+        self._neg.add(self._index(neg))
+
+    def _index(self, v: np.ndarray) -> np.ndarray:
+        return np.ceil(np.log(v) / self._log_gamma).astype(np.int64)
+
+    def _value(self, idx: np.ndarray) -> np.ndarray:
+        return 2 * self._gamma ** idx.astype(np.float64) / (self._gamma + 1)
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Add `other`'s counts into this sketch (in place); returns self."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("cannot merge sketches with different relative_accuracy")
+        self._pos.merge(other._pos)
+        self._neg.merge(other._neg)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def _buckets(self):
+        # buckets in ascending value order: negatives (largest magnitude first), zero, positives
+        values = np.concatenate([-self._value(self._neg.indices())[::-1], [0.0],
+                                 self._value(self._pos.indices())])
+        counts = np.concatenate([self._neg.counts[::-1], [self.zero_count], self._pos.counts])
+        return values, counts
+
+    def quantiles(self, qs: Sequence[float]) -> np.ndarray:
+        qs = np.asarray(qs, dtype=np.float64)
+        if not self.count:
+            return np.full(qs.shape, np.nan)
+        values, counts = self._buckets()
+        bucket = np.searchsorted(np.cumsum(counts), qs * (self.count - 1), side="right")
+        return np.clip(values[bucket], self.min, self.max)
+
+    def quantile(self, q: float) -> float:
+        return float(self.quantiles([q])[0])
+
+    def cdf(self, xs: Sequence[float], side: str = "right") -> np.ndarray:
+        """
+        Approximate fraction of values <= each x, or < x with side="left"
+        (same relative-accuracy bucketing; a bucket counts as below x only
+        if its representative value is).
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        if not self.count:
+            return np.full(xs.shape, np.nan)
+        values, counts = self._buckets()
+        below = np.concatenate([[0], np.cumsum(counts)])[np.searchsorted(values, xs, side=side)]
+        if side == "left":
+            return np.where(xs <= self.min, 0.0, np.where(xs > self.max, 1.0, below / self.count))
+        return np.where(xs < self.min, 0.0, np.where(xs >= self.max, 1.0, below / self.count))
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else math.nan
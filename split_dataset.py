@@ -0,0 +1,156 @@
+# split_dataset.py
+"""
+Stratified train/val split of the flat `images/` export (files like
+U+1F47D_0.png) into `emoji_dataset/`.
+
+Replaces build_dataset.py and 100prcntSplit.py.  Nothing is copied by
+default: the split is materialised as hard links (or symlinks), or just
+written to `emoji_dataset/manifest.csv` for loaders that read it directly.
+Every class is split on its own RNG seeded from (SEED, class), so the
+result is deterministic regardless of scheduling and a re-split with a
+different VAL_FRAC or seed only rewrites links.
+"""
+import os, csv, random, shutil, logging, argparse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+RAW_DIR   = Path("images")               # flat list of files like U+1F47D_0.png
+DST_ROOT  = Path("emoji_dataset")
+VAL_FRAC  = 0.2
+SEED      = 42
+MODES     = ("hardlink", "symlink", "copy", "manifest")
+MANIFEST  = "manifest.csv"
+
+
+def class_name(file_name: str) -> str:
+    """Extract 'U+1F600' from 'U+1F600_0.png'."""
+    return file_name.split("_")[0]
+
+
+def bucket_files(raw_dir: Path) -> Dict[str, List[Path]]:
+    buckets: Dict[str, List[Path]] = {}
+    for img in Path(raw_dir).glob("*.png"):
+        buckets.setdefault(class_name(img.name), []).append(img)
+    return buckets
+
+
+def split_class(cls: str, files: List[Path], val_frac: float, seed: int) -> Tuple[List[Path], List[Path]]:
+    """
+    Deterministic split of one class: ~`val_frac` to val, at least one file
+    in val when the class has two or more, and always at least one in train.
+    """
+    files = sorted(files)
+    n_val = max(1, int(len(files) * val_frac)) if val_frac > 0 else 0
+    n_val = min(n_val, len(files) - 1)
+
+    val = set(random.Random(f"{seed}/{cls}").sample(files, n_val))
+    train = [f for f in files if f not in val]
+    return train, sorted(val)
+
+
+def _place(src: Path, dst: Path, mode: str) -> None:
+    if mode == "hardlink":
+        try:
+            os.link(src, dst)
+            return
+        except OSError:                  # e.g. different filesystem
+            pass
+    elif mode == "symlink":
+        os.symlink(src.resolve(), dst)
+        return
+    shutil.copy2(src, dst)
+
+
+def _materialise(cls: str, splits: Dict[str, List[Path]], dst_root: Path, mode: str) -> None:
+    for split, files in splits.items():
+        out = dst_root / split / cls
+        out.mkdir(parents=True, exist_ok=True)
+        for f in files:
+            _place(f, out / f.name, mode)
+
+
+def write_manifest(rows: List[Tuple[Path, str, str]], path: Path) -> None:
+    """rows of (file, class, split); paths are stored relative to the manifest."""
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w", newline="") as fh:
+        w = csv.writer(fh)
+        w.writerow(["path", "label", "split"])
+        for f, cls, split in rows:
+            w.writerow([os.path.relpath(f, path.parent), cls, split])
+    os.replace(tmp, path)
+
+
+def read_manifest(path: Path, split: Optional[str] = None) -> List[Tuple[Path, str]]:
+    """(absolute file, class) pairs of `split` (all splits if None), in file order."""
+    path = Path(path)
+    with open(path, newline="") as fh:
+        return [(path.parent / row["path"], row["label"])
+                for row in csv.DictReader(fh)
+                if split is None or row["split"] == split]
+
+
+def build_split(
+    raw_dir: Path = RAW_DIR,
+    dst_root: Path = DST_ROOT,
+    val_frac: float = VAL_FRAC,
+    seed: int = SEED,
+    mode: str = "hardlink",
+    workers: Optional[int] = None,
+    force: bool = False
+) -> Dict[str, int]:
+    """
+    Split `raw_dir` into `dst_root`; returns the file count per split.
+
+    Existing split directories are replaced only if `dst_root` holds a
+    manifest from an earlier run of this tool, or with `force`.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+    dst_root = Path(dst_root)
+    dst_root.mkdir(parents=True, exist_ok=True)
+    existing = [dst_root / s for s in ("train", "val")
+                if (dst_root / s).is_dir() and any((dst_root / s).iterdir())]
+    if existing and not force and not (dst_root / MANIFEST).exists():
+        raise FileExistsError(f"{', '.join(map(str, existing))} not created by split_dataset; "
+                              f"pass force=True (--force) to replace")
+
+    buckets = bucket_files(raw_dir)
+    plan = {cls: dict(zip(("train", "val"), split_class(cls, files, val_frac, seed)))
+            for cls, files in sorted(buckets.items())}
+
+    # links are cheap to recreate, so a re-split simply starts over; in
+    # manifest mode this also drops directories that no longer match it
+    for split in existing:
+        logging.info(f"replacing {split}")
+        shutil.rmtree(split)
+    if mode != "manifest":
+        with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 4)) as pool:
+            list(pool.map(lambda item: _materialise(item[0], item[1], dst_root, mode),
+                          plan.items()))
+
+    rows = [(f, cls, split)
+            for cls, splits in plan.items()
+            for split, files in splits.items()
+            for f in files]
+    write_manifest(rows, dst_root / MANIFEST)
+
+    counts = {s: sum(len(p[s]) for p in plan.values()) for s in ("train", "val")}
+    logging.info(f"{len(plan)} classes — train: {counts['train']}, val: {counts['val']} ({mode})")
+    return counts
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s | %(message)s")
+    p = argparse.ArgumentParser(description="Stratified train/val split of the emoji images.")
+    p.add_argument("--raw-dir", type=Path, default=RAW_DIR)
+    p.add_argument("--dst", type=Path, default=DST_ROOT)
+    p.add_argument("--val-frac", type=float, default=VAL_FRAC)
+    p.add_argument("--seed", type=int, default=SEED)
+    p.add_argument("--mode", choices=MODES, default="hardlink",
+                   help="how to materialise the split (manifest = CSV only, no files)")
+    p.add_argument("--workers", type=int, default=None)
+    p.add_argument("--force", action="store_true",
+                   help="replace train/ and val/ even if they were not created by this tool")
+    args = p.parse_args()
+    build_split(args.raw_dir, args.dst, args.val_frac, args.seed, args.mode, args.workers, args.force)
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+from base64_to_img import base64_to_image
+from glyph_index import GlyphIndex, colour_signature, glyph_variants, phash
+
+ANGRY, POUTING = "U+1F620", "U+1F621"      # 😠 / 😡: same face, yellow vs red
+
+
+@pytest.fixture(scope="module")
+def index():
+    return GlyphIndex.build(["emojis.csv", "old_emojis.csv"])
+
+
+@pytest.fixture(scope="module")
+def renders():
+    """{unicode: (N, 3, 72, 72)} plain-RGB vendor renders of 😠 and 😡."""
+    df = pd.read_csv("old_emojis.csv").set_index("unicode")
+    out = {}
+    for label in (ANGRY, POUTING):
+        imgs = [base64_to_image(cell) for cell in df.loc[label].iloc[2:]]
+        out[label] = torch.stack([glyph_variants(img)[0] for img in imgs if img is not None])
+    return out
+
+
+def test_angry_and_pouting_do_not_resolve_to_each_other(index, renders):
+    for label, batch in renders.items():
+        for hit in index.match(batch):
+            assert hit is None or hit[0] == label
+
+
+def test_colour_separates_glyphs_with_equal_luma_hash(renders):
+    # Google's two faces differ only in hue: their grayscale pHashes are identical
+    angry, pouting = renders[ANGRY][1:2], renders[POUTING][1:2]
+    assert phash(angry)[0] == phash(pouting)[0]
+    only_pouting = GlyphIndex(phash(pouting), colour_signature(pouting), [POUTING], ["Google"])
+    assert only_pouting.match(pouting) == [(POUTING, "Google", 0)]
+    assert only_pouting.match(angry) == [None]
+
+
+def test_ambiguous_match_is_left_to_the_cnn(renders):
+    batch = renders[ANGRY][:1]
+    h, c = phash(batch), colour_signature(batch)
+    twins = GlyphIndex(np.repeat(h, 2), np.repeat(c, 2, axis=0), [ANGRY, POUTING], ["Apple", "Apple"])
+    assert twins.match(batch) == [None]
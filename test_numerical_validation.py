@@ -0,0 +1,61 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from numerical_validation import DataQualityMetrics
+
+
+def streamed(df, chunk=700):
+    """DataQualityMetrics fed `df` in chunks, split over two merged instances."""
+    a, b = DataQualityMetrics(), DataQualityMetrics()
+    for i, start in enumerate(range(0, len(df), chunk)):
+        (a if i % 2 else b).update(df.iloc[start:start + chunk])
+    return a.merge(b)
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    n = 5000
+    discrete = rng.integers(10, 15, n).astype(float)
+    discrete[::250] = 100.0                             # 20 clear outliers
+    ties = np.where(rng.random(n) < 0.9, 3.0, rng.integers(4, 9, n))   # Q1 == Q3 == 3
+    return pd.DataFrame({
+        'constant': np.full(n, 7.0),
+        'discrete': discrete,
+        'ties': ties,
+        'heavy_tail': rng.standard_t(3, n),
+    })
+
+
+def test_streaming_outliers_match_exact_on_constant_and_discrete(frame):
+    exact = DataQualityMetrics().detect_outliers(frame)
+    approx = streamed(frame).streaming_outliers()
+    assert exact['constant'] == approx['constant'] == 0
+    assert approx['discrete'] == exact['discrete'] == 20
+    assert approx['ties'] == exact['ties']
+
+
+def test_streaming_outliers_close_on_continuous(frame):
+    exact = DataQualityMetrics().detect_outliers(frame)['heavy_tail']
+    approx = streamed(frame).streaming_outliers()['heavy_tail']
+    assert abs(approx - exact) <= 0.15 * exact
+
+
+def test_streaming_moments_match_in_memory(frame):
+    exact = DataQualityMetrics().calculate_distribution_metrics(frame)
+    approx = streamed(frame).streaming_distribution_metrics()
+    for col in ('discrete', 'ties', 'heavy_tail'):
+        for key in ('mean', 'std', 'skewness', 'kurtosis'):
+            assert approx[col][key] == pytest.approx(exact[col][key], rel=1e-9, abs=1e-12)
+        assert approx[col]['median'] == pytest.approx(exact[col]['median'], rel=0.02)
+
+
+def test_detect_outliers_all_nan_column_is_quiet():
+    df = pd.DataFrame({'x': [1.0, 2.0, 3.0, 100.0], 'empty': [np.nan] * 4})
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        outliers = DataQualityMetrics().detect_outliers(df)
+    assert outliers == {'x': 1, 'empty': 0}
@@ -1,12 +1,28 @@
 # train_emojis.py
+#
+# single process:  python train_emojis.py
+# multi-process:   torchrun --standalone --nproc_per_node=4 train_emojis.py
+#                  (add --nnodes/--rdzv-endpoint to span hosts; DDP over gloo)
+import os, time, argparse
 import torch, torchvision
+import torch.distributed as dist
 from pathlib import Path
 from torch import nn
-from torch.utils.data import DataLoader
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader, Dataset, DistributedSampler
 from torchvision import transforms
 from torchvision.datasets import ImageFolder
+from torchvision.datasets.folder import default_loader
+
+import metrics
+from batch_augment import BatchAugment
+from checkpoints import (CheckpointManager, EarlyStopping, capture_rng_state,
+                         load_checkpoint, restore_rng_state)
+from emoji_shards import EmojiShardDataset, shards_available
+from split_dataset import MANIFEST, read_manifest
 
 DATA_ROOT   = Path("emoji_dataset")
+SHARD_ROOT  = Path("emoji_shards")   # built by emoji_shards.py; used when present
 IMG_SIZE    = 72           # your images are already 72×72
 BATCH_SIZE  = 64
 EPOCHS      = 15
@@ -26,16 +42,90 @@ train_tf = transforms.Compose([
 
 val_tf   = transforms.ToTensor()
 
+# shard samples are already uint8 tensors, so swap ToTensor for a dtype cast
+to_float       = transforms.ConvertImageDtype(torch.float)
+train_shard_tf = transforms.Compose(train_tf.transforms[:-1] + [to_float])
+val_shard_tf   = to_float
+
+# --batch-aug: loaders only collate uint8 tensors; BatchAugment runs per batch
+train_raw_tf   = transforms.PILToTensor()
+
 # ─────────────────────────────
 # 2️⃣  Datasets & loaders
 # ─────────────────────────────
-train_ds = ImageFolder(DATA_ROOT / "train", transform=train_tf)
-val_ds   = ImageFolder(DATA_ROOT / "val",   transform=val_tf)
+class ManifestImageFolder(Dataset):
+    """ImageFolder look-alike reading split_dataset.py's manifest.csv."""
+
+    def __init__(self, manifest: Path, split: str, transform=None):
+        self.classes = sorted({c for _, c in read_manifest(manifest, "train")})
+        self.class_to_idx = {c: i for i, c in enumerate(self.classes)}
+        self.samples = [(p, self.class_to_idx[c])
+                        for p, c in read_manifest(manifest, split)
+                        if c in self.class_to_idx]
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, idx):
+        path, target = self.samples[idx]
+        img = default_loader(path)
+        if self.transform is not None:
+            img = self.transform(img)
+        return img, target
+
+
+def build_datasets(batch_aug: bool = False):
+    """Shards if packed, else the manifest, else the ImageFolder tree."""
+    if shards_available(SHARD_ROOT):
+        return (EmojiShardDataset(SHARD_ROOT, "train",
+                                  transform=None if batch_aug else train_shard_tf),
+                EmojiShardDataset(SHARD_ROOT, "val", transform=val_shard_tf))
+    tf = train_raw_tf if batch_aug else train_tf
+    if (DATA_ROOT / MANIFEST).exists():
+        return (ManifestImageFolder(DATA_ROOT / MANIFEST, "train", transform=tf),
+                ManifestImageFolder(DATA_ROOT / MANIFEST, "val",   transform=val_tf))
+    return (ImageFolder(DATA_ROOT / "train", transform=tf),
+            ImageFolder(DATA_ROOT / "val",   transform=val_tf))
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:               # not on Linux
+        return os.cpu_count() or 1
 
-train_dl = DataLoader(train_ds, batch_size=BATCH_SIZE, shuffle=True,  num_workers=2)
-val_dl   = DataLoader(val_ds,   batch_size=BATCH_SIZE, shuffle=False, num_workers=2)
 
-class_names = train_ds.classes    # e.g. ['U+1F600', 'U+1F602', …]
+def loader_workers(cores: int) -> int:
+    """Leave most cores to the model: ~1 loader worker per 4 cores, at most 8."""
+    return max(1, min(8, cores // 4))
+
+
+def make_loader(ds, shuffle: bool, workers: int) -> DataLoader:
+    kw = {}
+    if workers > 0:
+        kw = dict(persistent_workers=True, prefetch_factor=4)
+    if dist.is_initialized() and shuffle:
+        # each rank sees its own 1/world_size slice; the sampler does the shuffling
+        kw["sampler"] = DistributedSampler(ds, shuffle=True)
+        shuffle = False
+    elif dist.is_initialized():
+        # evaluation: strided, unpadded shards, so the all-reduced metrics count
+        # every sample exactly once (DistributedSampler repeats some to even out)
+        kw["sampler"] = range(dist.get_rank(), len(ds), dist.get_world_size())
+    return DataLoader(ds, batch_size=BATCH_SIZE, shuffle=shuffle,
+                      num_workers=workers, pin_memory=DEVICE == "cuda", **kw)
+
+
+def setup_distributed(backend: str):
+    """Join the torchrun process group if launched by it; returns (rank, world_size)."""
+    if int(os.environ.get("WORLD_SIZE", "1")) <= 1:
+        return 0, 1
+    if DEVICE == "cuda":
+        torch.cuda.set_device(int(os.environ["LOCAL_RANK"]))
+    dist.init_process_group(backend=backend)
+    return dist.get_rank(), dist.get_world_size()
+
 
 # ─────────────────────────────
 # 3️⃣  A tiny CNN
@@ -59,24 +149,46 @@ class TinyEmojiNet(nn.Module):
         x = self.features(x).flatten(1)
         return self.classifier(x)
 
-model     = TinyEmojiNet(len(class_names)).to(DEVICE)
+
 criterion = nn.CrossEntropyLoss()
-optimizer = torch.optim.Adam(model.parameters(), lr=LR)
 
 # ─────────────────────────────
 # 4️⃣  Training loop
 # ─────────────────────────────
-def run_epoch(dl, train: bool):
+def run_epoch(model, dl, train: bool, optimizer=None,
+              channels_last: bool = False, amp_dtype=None, augment=None):
+    """
+    One pass over `dl`.  Returns (loss, acc, timing) where timing holds
+    images/sec and the seconds spent waiting on the loader, which tells an
+    input-bound epoch (high data_wait) from a compute-bound one.
+    `augment` (e.g. BatchAugment) is applied to each batch on the device.
+    """
     if train:
         model.train()
     else:
         model.eval()
     total, correct, loss_sum = 0, 0, 0.0
+    data_wait = 0.0
+    fmt = torch.channels_last if channels_last else torch.contiguous_format
+    autocast = torch.autocast(device_type=DEVICE, dtype=amp_dtype, enabled=amp_dtype is not None)
+    phase = "train" if train else "val"
+    wait_hist = metrics.STAGE_SECONDS.labels(phase, "data_wait")
+    step_hist = metrics.STAGE_SECONDS.labels(phase, "step")
+
+    start = tick = time.perf_counter()
     with torch.inference_mode() if not train else torch.enable_grad():
         for X, y in dl:
-            X, y = X.to(DEVICE), y.to(DEVICE)
-            logits = model(X)
-            loss   = criterion(logits, y)
+            fetched = time.perf_counter()
+            data_wait += fetched - tick
+            wait_hist.observe(fetched - tick)
+            X = X.to(DEVICE, non_blocking=True)
+            y = y.to(DEVICE, non_blocking=True)
+            if augment is not None:
+                X = augment(X)
+            X = X.contiguous(memory_format=fmt)
+            with autocast:
+                logits = model(X)
+                loss   = criterion(logits, y)
             if train:
                 optimizer.zero_grad()
                 loss.backward()
@@ -85,19 +197,171 @@ def run_epoch(dl, train: bool):
             preds     = logits.argmax(1)
             correct  += (preds == y).sum().item()
             total    += y.size(0)
-    return loss_sum / total, correct / total
+            tick = time.perf_counter()
+            step_hist.observe(tick - fetched)
 
-for epoch in range(1, EPOCHS + 1):
-    train_loss, train_acc = run_epoch(train_dl, train=True)
-    val_loss,   val_acc   = run_epoch(val_dl,   train=False)
-    print(f"[{epoch:02}/{EPOCHS}]  "
-          f"train {train_loss:.3f}/{train_acc:.2%}  |  "
-          f"val {val_loss:.3f}/{val_acc:.2%}")
+    if dist.is_initialized():
+        # global metrics: sum the per-rank counters
+        sums = torch.tensor([loss_sum, correct, total], dtype=torch.float64, device=DEVICE)
+        dist.all_reduce(sums)
+        loss_sum, correct, total = sums[0].item(), int(sums[1].item()), int(sums[2].item())
 
-# ─────────────────────────────
-# 5️⃣  Save the model
-# ─────────────────────────────
-torch.save({"model": model.state_dict(),
-            "classes": class_names},
-           "emoji_cnn.pt")
-print("✅ Model saved to emoji_cnn.pt")
+    elapsed = time.perf_counter() - start
+    timing = {"images_per_sec": total / elapsed if elapsed else 0.0,
+              "data_wait_s": data_wait, "elapsed_s": elapsed}
+    metrics.EPOCH_LOSS.labels(phase).set(loss_sum / total)
+    metrics.EPOCH_ACCURACY.labels(phase).set(correct / total)
+    metrics.EPOCH_THROUGHPUT.labels(phase).set(timing["images_per_sec"])
+    return loss_sum / total, correct / total, timing
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Train TinyEmojiNet.")
+    p.add_argument("--epochs", type=int, default=EPOCHS)
+    p.add_argument("--workers", type=int, default=None,
+                   help="DataLoader workers (default: sized from the core count)")
+    p.add_argument("--cpu-fast", action="store_true",
+                   help="shorthand for --channels-last --bf16 --compile")
+    p.add_argument("--channels-last", action="store_true")
+    p.add_argument("--bf16", action="store_true", help="bfloat16 autocast")
+    p.add_argument("--compile", action="store_true", help="torch.compile the model if available")
+    p.add_argument("--batch-aug", action="store_true",
+                   help="augment whole batches on the device instead of per image in the workers")
+    p.add_argument("--out", default="emoji_cnn.pt")
+    p.add_argument("--ckpt-dir", type=Path, default=Path("checkpoints"))
+    p.add_argument("--ckpt-every", type=int, default=1, help="save last.pt every N epochs")
+    p.add_argument("--keep-best", type=int, default=3, help="best-by-val_acc checkpoints to keep")
+    p.add_argument("--patience", type=int, default=5,
+                   help="stop after N epochs without val_acc improvement (0 = never)")
+    p.add_argument("--min-delta", type=float, default=0.0)
+    p.add_argument("--no-resume", dest="resume", action="store_false",
+                   help="delete the checkpoints in <ckpt-dir> and start from scratch")
+    p.add_argument("--backend", default="gloo", help="torch.distributed backend under torchrun")
+    p.add_argument("--metrics-port", type=int, default=None,
+                   help="expose Prometheus metrics on this port (rank 0)")
+    args = p.parse_args()
+    if args.cpu_fast:
+        args.channels_last = args.bf16 = args.compile = True
+    return args
+
+
+def main():
+    args = parse_args()
+    rank, world_size = setup_distributed(args.backend)
+    is_main = rank == 0
+
+    # processes on one host share its cores
+    cores = max(1, available_cores() // int(os.environ.get("LOCAL_WORLD_SIZE", "1")))
+    workers = loader_workers(cores) if args.workers is None else args.workers
+    if DEVICE == "cpu":
+        torch.set_num_threads(max(1, cores - workers))
+
+    train_ds, val_ds = build_datasets(args.batch_aug)
+    train_dl = make_loader(train_ds, shuffle=True,  workers=workers)
+    val_dl   = make_loader(val_ds,   shuffle=False, workers=workers)
+    class_names = train_ds.classes    # e.g. ['U+1F600', 'U+1F602', …]
+
+    model = TinyEmojiNet(len(class_names)).to(DEVICE)
+    if args.channels_last:
+        model = model.to(memory_format=torch.channels_last)
+    optimizer = torch.optim.Adam(model.parameters(), lr=LR)
+
+    # `model` keeps the plain state_dict; `net` is what actually runs
+    net = DistributedDataParallel(model) if world_size > 1 else model
+    if args.compile and hasattr(torch, "compile"):
+        net = torch.compile(net)
+    amp_dtype = torch.bfloat16 if args.bf16 else None
+    opts = dict(channels_last=args.channels_last, amp_dtype=amp_dtype)
+    augment = BatchAugment() if args.batch_aug else None
+
+    if is_main:
+        print(f"{world_size} process(es) × {cores} cores: {workers} loader workers, "
+              f"{torch.get_num_threads()} compute threads"
+              f" | channels_last={args.channels_last} bf16={args.bf16} compile={args.compile}"
+              f" batch_aug={args.batch_aug}")
+
+    if is_main and args.metrics_port is not None:
+        metrics.start_http_server(args.metrics_port)
+
+    # only rank 0 writes checkpoints, so only it clears them on --no-resume;
+    # the other ranks read the directory once it has
+    if is_main:
+        ckpt = CheckpointManager(args.ckpt_dir, keep_best=args.keep_best, classes=class_names,
+                                 resume=args.resume)
+    if world_size > 1:
+        dist.barrier()
+    if not is_main:
+        ckpt = CheckpointManager(args.ckpt_dir, keep_best=args.keep_best, classes=class_names)
+    stopper = EarlyStopping(args.patience, args.min_delta)
+    start_epoch, stopped = 1, False
+
+    if args.resume and ckpt.latest() is not None:
+        state = load_checkpoint(ckpt.latest(), map_location=DEVICE)
+        if state["classes"] != class_names:
+            raise ValueError(f"{ckpt.latest()} was trained on different classes; "
+                             f"use --no-resume or another --ckpt-dir")
+        model.load_state_dict(state["model"])
+        optimizer.load_state_dict(state["optimizer"])
+        stopper.load_state_dict(state["early_stopping"])
+        restore_rng_state(state["rng"])
+        start_epoch, stopped = state["epoch"] + 1, state["stopped"]
+        if is_main:
+            print(f"↻ Resumed from {ckpt.latest()} after epoch {state['epoch']}")
+
+    for epoch in range(start_epoch, args.epochs + 1):
+        if stopped:
+            break
+        if world_size > 1:
+            train_dl.sampler.set_epoch(epoch)
+        train_loss, train_acc, t = run_epoch(net, train_dl, train=True, optimizer=optimizer,
+                                               augment=augment, **opts)
+        val_loss,   val_acc,   _ = run_epoch(net, val_dl,   train=False, **opts)
+
+        # metrics are all-reduced, so every rank takes the same decision here
+        stopped = stopper.step(val_acc)
+        if not is_main:
+            dist.barrier()              # wait for rank 0's checkpoint before moving on
+            continue
+
+        print(f"[{epoch:02}/{args.epochs}]  "
+              f"train {train_loss:.3f}/{train_acc:.2%}  |  "
+              f"val {val_loss:.3f}/{val_acc:.2%}  |  "
+              f"{t['images_per_sec']:.0f} img/s, "
+              f"data-wait {t['data_wait_s']:.1f}s/{t['elapsed_s']:.1f}s")
+
+        state = {"epoch": epoch,
+                 "model": model.state_dict(),
+                 "optimizer": optimizer.state_dict(),
+                 "early_stopping": stopper.state_dict(),
+                 "stopped": stopped,
+                 "rng": capture_rng_state(),
+                 "classes": class_names,
+                 "val_acc": val_acc}
+        ckpt.update_best(epoch, val_acc, state)
+        if stopped or epoch % args.ckpt_every == 0 or epoch == args.epochs:
+            ckpt.save_last(state)
+        if stopped:
+            print(f"⏹  val_acc has not improved for {stopper.bad_epochs} epochs — stopping early")
+        if world_size > 1:
+            dist.barrier()
+
+    if world_size > 1:
+        dist.destroy_process_group()
+    if not is_main:
+        return
+
+    # ─────────────────────────────
+    # 5️⃣  Save the model
+    # ─────────────────────────────
+    best = ckpt.best_path()
+    if best is not None:
+        model.load_state_dict(load_checkpoint(best, map_location=DEVICE)["model"])
+        print(f"Using best epoch {ckpt.best[0]['epoch']} (val_acc {ckpt.best[0]['score']:.2%})")
+    torch.save({"model": model.state_dict(),
+                "classes": class_names},
+               args.out)
+    print(f"✅ Model saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,18 @@
+import io
+import os
+import base64
+import struct
+import hashlib
+import binascii
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 import warnings
 
+from numerical_validation import DataQualityMetrics
+
 class DataValidator:
     def __init__(self):
         self.validation_results = {}
@@ -40,15 +50,9 @@ class DataValidator:
         
         for col, checks in range_checks.items():
             if col in df.columns:
-                if 'min' in checks:
-                    invalid_count = (df[col] < checks['min']).sum()
-                    if invalid_count > 0:
-                        range_errors.append(f"Column '{col}': {invalid_count} values below minimum {checks['min']}")
-                
-                if 'max' in checks:
-                    invalid_count = (df[col] > checks['max']).sum()
-                    if invalid_count > 0:
-                        range_errors.append(f"Column '{col}': {invalid_count} values above maximum {checks['max']}")
+                below = (df[col] < checks['min']).sum() if 'min' in checks else 0
+                above = (df[col] > checks['max']).sum() if 'max' in checks else 0
+                range_errors.extend(_range_messages(col, checks, below, above))
         
         if range_errors:
             self.errors.extend(range_errors)
@@ -61,13 +65,107 @@ class DataValidator:
         for col in df.columns:
             missing_ratio = df[col].isnull().sum() / len(df)
             if missing_ratio > max_missing_ratio:
-                missing_issues.append(f"Column '{col}': {missing_ratio:.2%} missing values")
+                missing_issues.append(_missing_message(col, missing_ratio))
         
         if missing_issues:
             self.warnings.extend(missing_issues)
         
         return len(missing_issues) == 0
     
+    def validate_file(
+        self,
+        path: str,
+        expected_columns: Optional[List[str]] = None,
+        expected_types: Optional[Dict[str, str]] = None,
+        range_checks: Optional[Dict[str, Dict]] = None,
+        max_missing_ratio: Optional[float] = 0.1,
+        chunksize: int = 10000,
+        workers: int = 1
+    ) -> bool:
+        """
+        Out-of-core version of validate_schema, validate_data_types,
+        validate_value_ranges and check_missing_values: streams a CSV or
+        Parquet file in chunks, evaluates all checks in one pass per chunk
+        and adds the same errors/warnings the in-memory checks would.
+        Checks whose argument is None are skipped.
+        """
+        stats = scan_file(path, range_checks, chunksize, workers)
+        self.validation_results[path] = stats
+        ok = True
+        
+        if expected_columns is not None:
+            missing_cols = set(expected_columns) - set(stats.columns)
+            extra_cols = set(stats.columns) - set(expected_columns)
+            if missing_cols:
+                self.errors.append(f"Missing columns: {missing_cols}")
+            if extra_cols:
+                self.warnings.append(f"Extra columns found: {extra_cols}")
+            ok &= not missing_cols
+        
+        if expected_types is not None:
+            type_errors = [f"Column '{col}': expected {expected_type}, got {stats.dtypes[col]}"
+                           for col, expected_type in expected_types.items()
+                           if col in stats.dtypes and expected_type not in stats.dtypes[col]]
+            self.errors.extend(type_errors)
+            ok &= not type_errors
+        
+        if range_checks is not None:
+            range_errors = []
+            for col, checks in range_checks.items():
+                if col in stats.dtypes:
+                    range_errors.extend(_range_messages(col, checks, stats.below.get(col, 0),
+                                                        stats.above.get(col, 0)))
+            self.errors.extend(range_errors)
+            ok &= not range_errors
+        
+        if max_missing_ratio is not None and stats.rows:
+            missing_issues = [_missing_message(col, stats.nulls[col] / stats.rows)
+                              for col in stats.columns
+                              if stats.nulls[col] / stats.rows > max_missing_ratio]
+            self.warnings.extend(missing_issues)
+            ok &= not missing_issues
+        
+        return ok
+    
+    def validate_image_file(
+        self,
+        path: str,
+        vendors: Optional[List[str]] = None,
+        id_column: str = 'unicode',
+        expected_size: Optional[Tuple[int, int]] = None,
+        chunksize: int = 10000,
+        workers: int = 1
+    ) -> bool:
+        """
+        Check the base-64 image columns of an emoji CSV/Parquet file without
+        decoding any image: data-URL header, strict base-64, PNG signature
+        and IHDR dimensions (from the first 24 bytes only), plus duplicate
+        glyphs across cells.  Per-vendor completeness from DataQualityMetrics
+        is kept in validation_results[path]['completeness'].
+        """
+        stats = _scan(path, ImageStats, {'vendors': vendors, 'id_column': id_column},
+                      chunksize, workers)
+        self.validation_results[path] = {
+            'images': stats,
+            'completeness': DataQualityMetrics().calculate_image_completeness(stats.status, stats.rows)
+        }
+        
+        image_errors = []
+        for vendor, counts in stats.status.items():
+            for status, label in PAYLOAD_ERRORS.items():
+                if counts[status]:
+                    image_errors.append(f"Column '{vendor}': {counts[status]} payloads with {label}")
+            if expected_size is not None:
+                wrong = sum(n for size, n in stats.sizes[vendor].items() if size != tuple(expected_size))
+                if wrong:
+                    image_errors.append(f"Column '{vendor}': {wrong} images not {expected_size[0]}x{expected_size[1]}")
+        
+        for cells in stats.duplicates().values():
+            self.warnings.append("Duplicate glyph: " + ', '.join(f"{row}/{vendor}" for row, vendor in cells))
+        
+        self.errors.extend(image_errors)
+        return len(image_errors) == 0
+    
     def generate_report(self) -> Dict[str, Any]:
         return {
             'validation_passed': len(self.errors) == 0,
@@ -75,4 +173,303 @@ class DataValidator:
             'warnings': self.warnings,
             'error_count': len(self.errors),
             'warning_count': len(self.warnings)
-        }
\ No newline at end of file
+        }
+
+
+def _range_messages(col: str, checks: Dict, below: int, above: int) -> List[str]:
+    messages = []
+    if 'min' in checks and below > 0:
+        messages.append(f"Column '{col}': {below} values below minimum {checks['min']}")
+    if 'max' in checks and above > 0:
+        messages.append(f"Column '{col}': {above} values above maximum {checks['max']}")
+    return messages
+
+
+def _missing_message(col: str, missing_ratio: float) -> str:
+    return f"Column '{col}': {missing_ratio:.2%} missing values"
+
+
+# what read_csv infers for text: 'str' on pandas >= 3, 'object' before
+_TEXT_DTYPE = str(pd.read_csv(io.StringIO('a\nx')).dtypes['a'])
+
+
+def _promote(a: str, b: str) -> str:
+    """
+    dtype of a column whose non-null chunks came out as `a` and `b`, as
+    read_csv would infer it from the whole file: numbers widen, and any
+    other mix (text, bools, numbers) is parsed as text.
+    """
+    if a == b:
+        return a
+    try:
+        da, db = np.dtype(a), np.dtype(b)
+    except TypeError:                           # pandas extension dtypes, e.g. 'str'
+        return _TEXT_DTYPE
+    if da.kind in 'iuf' and db.kind in 'iuf':
+        return str(np.promote_types(da, db))
+    return _TEXT_DTYPE
+
+
+def _with_nulls(dtype: str) -> str:
+    """dtype of a column of `dtype` values once nulls are mixed in."""
+    try:
+        kind = np.dtype(dtype).kind
+    except TypeError:
+        return dtype
+    return {'i': 'float64', 'u': 'float64', 'b': 'object'}.get(kind, dtype)
+
+
+class ValidationStats:
+    """Mergeable per-column counts behind the file checks; one instance per chunk or worker."""
+
+    def __init__(self):
+        self.rows = 0
+        self.columns: List[str] = []
+        # chunks where a column is all null say nothing about its type, so
+        # their dtype is only used if no chunk has a value
+        self.value_dtypes: Dict[str, str] = {}
+        self.null_dtypes: Dict[str, str] = {}
+        self.nulls: Dict[str, int] = {}
+        self.below: Dict[str, int] = {}
+        self.above: Dict[str, int] = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, range_checks: Optional[Dict[str, Dict]] = None) -> 'ValidationStats':
+        stats = cls()
+        stats.rows = len(df)
+        stats.columns = list(df.columns)
+        stats.nulls = {col: int(n) for col, n in df.isnull().sum().items()}
+        for col, dtype in df.dtypes.items():
+            if stats.nulls[col] == len(df):
+                stats.null_dtypes[col] = str(dtype)
+            elif dtype == object and pd.api.types.infer_dtype(df[col], skipna=True) == 'boolean':
+                stats.value_dtypes[col] = 'bool'        # bools with nulls; _with_nulls restores object
+            else:
+                stats.value_dtypes[col] = str(dtype)
+        for col, checks in (range_checks or {}).items():
+            if col in df.columns:
+                values = df[col]
+                if 'min' in checks:
+                    stats.below[col] = int((values < checks['min']).sum())
+                if 'max' in checks:
+                    stats.above[col] = int((values > checks['max']).sum())
+        return stats
+
+    def merge(self, other: 'ValidationStats') -> 'ValidationStats':
+        """Add a later chunk's counts into these (in place); returns self."""
+        if not self.columns:
+            self.columns = list(other.columns)
+        for col, dtype in other.value_dtypes.items():
+            mine = self.value_dtypes.get(col)
+            self.value_dtypes[col] = dtype if mine is None else _promote(mine, dtype)
+        for col, dtype in other.null_dtypes.items():
+            self.null_dtypes.setdefault(col, dtype)
+        for mine, theirs in ((self.nulls, other.nulls), (self.below, other.below),
+                             (self.above, other.above)):
+            for col, n in theirs.items():
+                mine[col] = mine.get(col, 0) + n
+        self.rows += other.rows
+        return self
+
+    @property
+    def dtypes(self) -> Dict[str, str]:
+        """Column dtypes as pandas would infer them reading the whole file at once."""
+        dtypes = {}
+        for col in self.columns:
+            if col in self.value_dtypes:
+                dtype = self.value_dtypes[col]
+                dtypes[col] = _with_nulls(dtype) if self.nulls.get(col) else dtype
+            elif col in self.null_dtypes:
+                dtypes[col] = self.null_dtypes[col]
+        return dtypes
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+DATA_URL_PREFIX = 'data:image/png;base64,'
+NON_VENDOR = {'emoji', 'unicode', 'Description'}
+PAYLOAD_ERRORS = {
+    'bad_header': 'an invalid data-URL header',
+    'bad_base64': 'invalid base-64',
+    'bad_signature': 'no PNG signature',
+    'bad_ihdr': 'no IHDR chunk',
+}
+
+
+def inspect_payload(cell: str) -> Tuple[str, int, int]:
+    """
+    (status, width, height) of one image cell.  Only the first 32 base-64
+    characters — signature, IHDR length/type, width and height — are
+    decoded; the rest is just checked to be strict base-64.
+    """
+    if not cell.startswith(DATA_URL_PREFIX):
+        return 'bad_header', 0, 0
+    body = cell[len(DATA_URL_PREFIX):]
+    try:
+        binascii.a2b_base64(body, strict_mode=True)
+        head = base64.b64decode(body[:32])
+    except binascii.Error:
+        return 'bad_base64', 0, 0
+    if head[:8] != PNG_SIGNATURE:
+        return 'bad_signature', 0, 0
+    if len(head) < 24 or head[12:16] != b'IHDR':
+        return 'bad_ihdr', 0, 0
+    width, height = struct.unpack('>II', head[16:24])
+    return 'ok', width, height
+
+
+class ImageStats:
+    """Mergeable per-vendor payload counts, image sizes and content hashes."""
+
+    def __init__(self):
+        self.rows = 0
+        self.status: Dict[str, Counter] = defaultdict(Counter)     # vendor → status → cells
+        self.sizes: Dict[str, Counter] = defaultdict(Counter)      # vendor → (w, h) → cells
+        self.cells: Dict[str, List[Tuple[Any, str]]] = defaultdict(list)   # digest → [(row, vendor)]
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, vendors: Optional[List[str]] = None,
+                   id_column: str = 'unicode') -> 'ImageStats':
+        stats = cls()
+        stats.rows = len(df)
+        if vendors is None:
+            vendors = [c for c in df.columns if c not in NON_VENDOR and not str(c).startswith('Unnamed')]
+        ids = df[id_column] if id_column in df.columns else df.index.to_series()
+        for vendor in vendors:
+            status, sizes = stats.status[vendor], stats.sizes[vendor]
+            status['missing'] = len(df) - int(df[vendor].count()) if vendor in df.columns else len(df)
+            if vendor not in df.columns:
+                continue
+            present = df[vendor].notna()
+            for row, cell in zip(ids[present], df[vendor][present]):
+                if not isinstance(cell, str):
+                    status['bad_header'] += 1
+                    continue
+                result, width, height = inspect_payload(cell)
+                status[result] += 1
+                if result == 'ok':
+                    sizes[width, height] += 1
+                    # same digest as base64_to_img.payload_digest
+                    digest = hashlib.blake2b(cell[len(DATA_URL_PREFIX):].strip().encode(),
+                                             digest_size=16).hexdigest()
+                    stats.cells[digest].append((row, vendor))
+        return stats
+
+    def merge(self, other: 'ImageStats') -> 'ImageStats':
+        """Add a later chunk's counts into these (in place); returns self."""
+        self.rows += other.rows
+        for mine, theirs in ((self.status, other.status), (self.sizes, other.sizes)):
+            for vendor, counts in theirs.items():
+                mine[vendor].update(counts)
+        for digest, cells in other.cells.items():
+            self.cells[digest].extend(cells)
+        return self
+
+    def duplicates(self) -> Dict[str, List[Tuple[Any, str]]]:
+        """Digests shared by more than one cell."""
+        return {d: cells for d, cells in self.cells.items() if len(cells) > 1}
+
+
+class _ByteRange(io.RawIOBase):
+    """File-like view of bytes [start, end) of a file."""
+
+    def __init__(self, path: str, start: int, end: int):
+        self._f = open(path, 'rb')
+        self._f.seek(start)
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        n = self._f.readinto(memoryview(buf)[:max(0, min(len(buf), self._remaining))])
+        self._remaining -= n
+        return n
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+
+def _csv_ranges(path: str, parts: int) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """Header columns and `parts` byte ranges of the data rows, split at line ends."""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.readline()
+        bounds = [f.tell()]
+        for i in range(1, parts):
+            f.seek(max(bounds[-1], bounds[0] + (size - bounds[0]) * i // parts))
+            f.readline()
+            bounds.append(f.tell())
+    bounds.append(size)
+    columns = list(pd.read_csv(io.BytesIO(header), nrows=0).columns)
+    return columns, [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def iter_file_chunks(path: str, chunksize: int = 10000) -> Iterator[pd.DataFrame]:
+    """DataFrames of at most `chunksize` rows from a CSV or Parquet file."""
+    if path.endswith(('.parquet', '.pq')):
+        import pyarrow.parquet as pq             # optional dependency
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+def _scan_csv_range(path, columns, start, end, stats_cls, kwargs, chunksize):
+    stats = stats_cls()
+    with io.BufferedReader(_ByteRange(path, start, end)) as f:
+        for chunk in pd.read_csv(f, header=None, names=columns, chunksize=chunksize):
+            stats.merge(stats_cls.from_frame(chunk, **kwargs))
+    return stats
+
+
+def _scan_row_groups(path, groups, stats_cls, kwargs, chunksize):
+    import pyarrow.parquet as pq
+    stats = stats_cls()
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, row_groups=groups):
+        stats.merge(stats_cls.from_frame(batch.to_pandas(), **kwargs))
+    return stats
+
+
+def _scan(path: str, stats_cls, kwargs: Dict, chunksize: int, workers: int):
+    """
+    One pass over a CSV/Parquet file; memory is bounded by `chunksize` rows
+    per process.  With `workers` > 1 a CSV is split into byte ranges at line
+    ends (so quoted fields must not contain newlines, and row labels restart
+    in each range) and a Parquet file by row groups, each scanned in its own
+    process and merged in order.
+    """
+    if workers <= 1:
+        stats = stats_cls()
+        for chunk in iter_file_chunks(path, chunksize):
+            stats.merge(stats_cls.from_frame(chunk, **kwargs))
+        return stats
+
+    if path.endswith(('.parquet', '.pq')):
+        import pyarrow.parquet as pq
+        n_groups = pq.ParquetFile(path).num_row_groups
+        jobs = [(_scan_row_groups, path, list(g), stats_cls, kwargs, chunksize)
+                for g in np.array_split(np.arange(n_groups), min(workers, n_groups)) if len(g)]
+    else:
+        columns, ranges = _csv_ranges(path, workers)
+        jobs = [(_scan_csv_range, path, columns, a, b, stats_cls, kwargs, chunksize)
+                for a, b in ranges]
+
+    stats = stats_cls()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for part in pool.map(_call, jobs):
+            stats.merge(part)
+    if stats_cls is ValidationStats and not stats.columns and not path.endswith(('.parquet', '.pq')):
+        stats.columns = columns                 # header-only file
+    return stats
+
+
+def scan_file(path: str, range_checks: Optional[Dict[str, Dict]] = None,
+              chunksize: int = 10000, workers: int = 1) -> ValidationStats:
+    """Column counts behind DataValidator.validate_file, in one pass (see _scan)."""
+    return _scan(path, ValidationStats, {'range_checks': range_checks}, chunksize, workers)
+
+
+def _call(job):
+    fn, *args = job
+    return fn(*args)
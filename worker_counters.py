@@ -0,0 +1,46 @@
+# worker_counters.py
+"""
+Prediction counters that stay exact under threads and across pre-forked
+worker processes.
+
+The arrays live in anonymous shared memory created before the fork.  Each
+worker owns one slot and is its only writer (its threads serialise on a
+local lock), so there is no cross-process read-modify-write race; readers
+simply aggregate all slots.
+"""
+import threading, time
+from datetime import datetime
+from multiprocessing import RawArray
+from typing import Optional
+
+
+class WorkerCounters:
+    def __init__(self, n_workers: int = 1):
+        self._counts = RawArray("q", n_workers)      # predictions per worker
+        self._last = RawArray("d", n_workers)        # last prediction, epoch seconds
+        self._slot = 0
+        self._lock = threading.Lock()
+
+    def bind(self, slot: int) -> None:
+        """Called in a worker after fork: claim its slot."""
+        self._slot = slot
+        self._lock = threading.Lock()
+
+    def increment(self, n: int = 1) -> float:
+        now = time.time()
+        with self._lock:
+            self._counts[self._slot] += n
+            self._last[self._slot] = now
+        return now
+
+    @property
+    def total(self) -> int:
+        return sum(self._counts)
+
+    @property
+    def last(self) -> Optional[datetime]:
+        latest = max(self._last)
+        return datetime.fromtimestamp(latest) if latest else None
+
+    def per_worker(self):
+        return list(self._counts)
@@ -1,8 +1,150 @@
 import cv2
 import os
 import sys
+import glob
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
 from ultralytics import YOLO
 
+import metrics
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+class YoloDetector:
+    """
+    Pretrained YOLOv8 wrapper: runs detection on batches of images and
+    draws bounding boxes with labels.
+
+    Loaded models are cached by path for the lifetime of the process, so
+    any number of detectors (or `detect_and_save` calls) sharing a
+    `model_path` load the weights only once.
+    """
+    _models: Dict[str, YOLO] = {}
+    _models_lock = threading.Lock()
+
+    def __init__(self, model_path: str = "yolov8n.pt", conf_thresh: float = 0.45):
+        self.model = self.load_model(model_path)
+        self.conf_thresh = conf_thresh
+
+    @classmethod
+    def load_model(cls, model_path: str) -> YOLO:
+        with cls._models_lock:
+            if model_path not in cls._models:
+                cls._models[model_path] = YOLO(model_path)
+            return cls._models[model_path]
+
+    def detect(self, images: List) -> List:
+        """One batched forward pass over BGR images; one result per image."""
+        if not images:
+            return []
+        with metrics.stage_timer("yolo", "inference"):
+            return self.model(images, conf=self.conf_thresh, verbose=False)
+
+    def annotate(self, img, result):
+        """Draw boxes and labels onto `img` in place."""
+        with metrics.stage_timer("yolo", "draw"):
+            for box, cls_id, conf in zip(
+                result.boxes.xyxy, result.boxes.cls, result.boxes.conf
+            ):
+                x1, y1, x2, y2 = map(int, box)
+                label = f"{self.model.names[int(cls_id)]} {conf:.2f}"
+                cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                cv2.putText(
+                    img,
+                    label,
+                    (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    0.5,
+                    (0, 255, 0),
+                    1,
+                )
+        return img
+
+    def process_paths(
+        self,
+        image_paths: List[str],
+        batch_size: int = 16,
+        io_workers: int = 4,
+        out_suffix: str = "_done"
+    ) -> List[str]:
+        """
+        Detect, annotate and save every image.  Reading the next batch and
+        writing the previous one happen on a background I/O pool while the
+        current batch is in the model.  Returns the written paths.
+        """
+        batches = [image_paths[i:i + batch_size] for i in range(0, len(image_paths), batch_size)]
+        written, pending_writes = [], deque()
+
+        with ThreadPoolExecutor(max_workers=io_workers) as io:
+            def read(batch):
+                return [io.submit(_timed, "decode", cv2.imread, p) for p in batch]
+
+            next_reads = read(batches[0]) if batches else []
+            for i, batch in enumerate(batches):
+                imgs = [f.result() for f in next_reads]
+                next_reads = read(batches[i + 1]) if i + 1 < len(batches) else []
+
+                loaded = [(p, img) for p, img in zip(batch, imgs) if img is not None]
+                for p, img in zip(batch, imgs):
+                    if img is None:
+                        print(f"⚠️  Cannot load image: {p}", file=sys.stderr)
+
+                results = self.detect([img for _, img in loaded])
+                for (path, img), result in zip(loaded, results):
+                    out_path = output_path(path, out_suffix)
+                    pending_writes.append(
+                        (out_path, io.submit(_timed, "write", cv2.imwrite, out_path,
+                                             self.annotate(img, result))))
+
+                # keep at most two batches of annotated images waiting on disk
+                while len(pending_writes) > 2 * batch_size:
+                    written.append(_finish_write(*pending_writes.popleft()))
+
+            while pending_writes:
+                written.append(_finish_write(*pending_writes.popleft()))
+
+        return [p for p in written if p]
+
+
+def _timed(stage: str, fn, *args):
+    with metrics.stage_timer("yolo", stage):
+        return fn(*args)
+
+
+def output_path(image_path: str, out_suffix: str = "_done") -> str:
+    base, ext = os.path.splitext(image_path)
+    return f"{base}{out_suffix}{ext}"
+
+
+def _finish_write(out_path: str, future) -> Optional[str]:
+    if not future.result():
+        print(f"⚠️  Could not write: {out_path}", file=sys.stderr)
+        return None
+    print(f"✅ Saved: {out_path}")
+    return out_path
+
+
+def expand_inputs(inputs: Iterable[str], out_suffix: str = "_done") -> List[str]:
+    """Files, directories (their images) and glob patterns → sorted image paths."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths += [os.path.join(item, f) for f in os.listdir(item)]
+        elif glob.has_magic(item):
+            paths += glob.glob(item, recursive=True)
+        else:
+            paths.append(item)
+    return sorted(
+        p for p in set(paths)
+        if p.lower().endswith(IMAGE_EXTS)
+        and not os.path.splitext(p)[0].endswith(out_suffix)   # our own outputs
+    )
+
 
 def detect_and_save(
     image_path: str,
@@ -15,40 +157,37 @@ def detect_and_save(
     draws bounding boxes with labels, and saves the result
     with the original filename plus a suffix.
     """
-    # Load the model once
-    model = YOLO(model_path)
+    # The model is loaded once per process (see YoloDetector.load_model)
+    detector = YoloDetector(model_path, conf_thresh)
 
     # Read the input image
     img = cv2.imread(image_path)
     if img is None:
         raise FileNotFoundError(f"Cannot load image: {image_path}")
 
-    # Run inference
-    results = model(img, conf=conf_thresh)[0]
-
-    # Draw boxes and labels
-    for box, cls_id, conf in zip(
-        results.boxes.xyxy, results.boxes.cls, results.boxes.conf
-    ):
-        x1, y1, x2, y2 = map(int, box)
-        label = f"{model.names[int(cls_id)]} {conf:.2f}"
-        cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
-        cv2.putText(
-            img,
-            label,
-            (x1, y1 - 10),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            (0, 255, 0),
-            1,
-        )
+    # Run inference, draw boxes and labels
+    detector.annotate(img, detector.detect([img])[0])
 
     # Build output path and save
-    base, ext = os.path.splitext(image_path)
-    out_path = f"{base}{out_suffix}{ext}"
+    out_path = output_path(image_path, out_suffix)
     cv2.imwrite(out_path, img)
     print(f"✅ Saved: {out_path}")
 
 
 if __name__ == "__main__":
-    detect_and_save(r"./car.jpg")
+    p = argparse.ArgumentParser(description="Annotate images with YOLOv8 detections.")
+    p.add_argument("inputs", nargs="*", default=["./car.jpg"],
+                   help="image files, directories or glob patterns")
+    p.add_argument("--model", default="yolov8n.pt")
+    p.add_argument("--conf", type=float, default=0.45)
+    p.add_argument("--batch-size", type=int, default=16)
+    p.add_argument("--io-workers", type=int, default=4)
+    p.add_argument("--suffix", default="_done")
+    args = p.parse_args()
+
+    paths = expand_inputs(args.inputs, args.suffix)
+    if len(paths) == 1 and paths[0] in args.inputs:
+        detect_and_save(paths[0], args.model, args.conf, args.suffix)
+    else:
+        YoloDetector(args.model, args.conf).process_paths(
+            paths, args.batch_size, args.io_workers, args.suffix)